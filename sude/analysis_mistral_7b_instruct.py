@@ -1,55 +1,179 @@
+import hashlib
 import json
+import os
 import subprocess
 import time
 
-# Yorumları yükle
-with open("data/response.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Yayınlanmış ve uzun yorumları filtrele
-reviews = [r for r in data["reviews"] if r.get("status") == "published" and len(r.get("comment", "")) > 10]
+DATA_PATH = "data/response.json"
+# Tamamlanan batch'lerin sonuçları buraya satır satır (JSONL) eklenir.
+# Script yarıda kesilirse tekrar çalıştırıldığında bu dosyadaki batch'ler atlanır.
+CHECKPOINT_PATH = "data/mistral_labels.checkpoint.jsonl"
+MODEL = "mistral:7b-instruct"
 
 batch_size = 10
 
-for i in range(0, len(reviews), batch_size):
-    batch = reviews[i:i + batch_size]
-    if not batch:
-        continue
+# Sabit time.sleep(1) yerine sunucu gecikmesine göre ayarlanan bekleme.
+# Gecikme en hızlı gözlenen değerin üzerine çıktıkça (sunucu yükleniyor) bekleme uzar,
+# sunucu rahatken hiç beklenmez.
+PACE_FACTOR = 0.5      # baz gecikmenin üzerindeki her saniye için bekleme (sn)
+MAX_PAUSE = 10.0       # tek seferde en fazla bekleme (sn)
+EWMA_ALPHA = 0.3       # gecikme ortalamasında son ölçümün ağırlığı
+MAX_RETRIES = 3        # hata veren batch için deneme sayısı
+
+
+def batch_key(batch):
+    """Batch'i içindeki yorum id'lerinden türetilen sabit bir anahtarla tanımlar."""
+    ids = ",".join(str(r["id"]) for r in batch)
+    return hashlib.sha1(ids.encode("utf-8")).hexdigest()
+
+
+def load_completed_batches(path):
+    """Checkpoint dosyasındaki tamamlanmış batch anahtarlarını okur."""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                completed.add(json.loads(line)["batch_key"])
+            except (json.JSONDecodeError, KeyError):
+                # Yazılırken kesilmiş son satır olabilir; o batch tekrar işlenir.
+                continue
+    return completed
+
+
+def append_checkpoint(path, key, results):
+    """Bir batch'in sonucunu checkpoint dosyasına ekler ve diske yazılmasını garanti eder."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"batch_key": key, "results": results}, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
 
-    print(f"\n🔄 İşleniyor: Yorum {i+1} - {i+len(batch)} arası")
 
-    # PROMPT oluştur
+def build_prompt(batch):
     prompt = (
-        "Aşağıda 10 yorumu göreceksin.\n"
+        f"Aşağıda {len(batch)} yorumu göreceksin.\n"
         "Her yorum için:\n"
         "1) yorumun duygusunu 'positive' | 'negative' | 'neutral' olarak belirtin\n"
         "2) yorumda hangi ürün özellikleri geçiyor? (kalite, fiyat, kargo, ambalaj, kullanım, destek)\n"
         "3) ürünün artı yönlerini çıkarın\n"
         "4) ürünün eksi yönlerini çıkarın\n"
-        "Lütfen şöyle bir JSON çıktısı verin:\n"
+        "Lütfen şöyle bir JSON çıktısı verin (\"no\" alanı yorumun numarasıdır):\n"
         "[\n"
-        "  { \"sentiment\": \"...\", \"features\": [...], \"pros\": [...], \"cons\": [...] },\n"
+        "  { \"no\": 1, \"sentiment\": \"...\", \"features\": [...], \"pros\": [...], \"cons\": [...] },\n"
         "  ...\n"
         "]\n\n"
     )
-
     for idx, review in enumerate(batch, 1):
         comment = review["comment"].replace("\n", " ").strip()
         prompt += f"{idx}. {comment}\n"
+    return prompt
+
+
+def parse_batch_output(output, batch):
+    """
+    Model çıktısındaki JSON dizisini bulur ve her elemanı yorum id'siyle eşler.
+    Dizi bulunamazsa veya eleman sayısı tutmazsa None döner.
+    """
+    start = output.find("[")
+    if start == -1:
+        return None
+    try:
+        # Diziden sonra gelen model notları (içinde "[...]" olsa bile) ayrıştırmayı bozmasın
+        items, _ = json.JSONDecoder().raw_decode(output[start:])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(items, list):
+        return None
+
+    results = []
+    for position, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            continue
+        # Model "no" alanını verdiyse onu, vermediyse sırayı kullan.
+        no = item.pop("no", position)
+        if not isinstance(no, int) or not 1 <= no <= len(batch):
+            continue
+        item["review_id"] = batch[no - 1]["id"]
+        results.append(item)
+
+    # Her yorum tam olarak bir kez: tekrarlanan "no" değerleri fazladan sonuç üretmesin
+    if len(results) != len(batch) or len({r["review_id"] for r in results}) != len(batch):
+        return None
+    return results
 
-    print("\n📤 MODELE GİDEN PROMPT:\n", prompt)
 
-    # Modele gönder
-    command = ['ollama', 'run', 'mistral:7b-instruct', prompt]
+def run_model(prompt):
+    """Modeli çalıştırır; (çıktı, gecikme_sn, başarılı_mı) döner."""
+    command = ['ollama', 'run', MODEL, prompt]
+    started = time.perf_counter()
     result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    latency = time.perf_counter() - started
+    output = result.stdout.decode('utf-8', errors='replace')
+    return output, latency, result.returncode == 0
 
-    try:
-        output = result.stdout.decode('utf-8', errors='ignore')
-    except Exception as e:
-        output = result.stdout.decode(errors='replace')
 
-    print("\n📥 MODEL ÇIKTISI:\n")
-    print(output)
-    print("-" * 80)
+def main():
+    # Yorumları yükle
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Yayınlanmış ve uzun yorumları filtrele
+    reviews = [r for r in data["reviews"] if r.get("status") == "published" and len(r.get("comment", "")) > 10]
+
+    completed = load_completed_batches(CHECKPOINT_PATH)
+    if completed:
+        print(f"♻️ Checkpoint bulundu: {len(completed)} batch daha önce tamamlanmış, atlanacak.")
+
+    baseline = None   # en hızlı gözlenen gecikme
+    ewma = None       # gecikmenin üstel hareketli ortalaması
+
+    for i in range(0, len(reviews), batch_size):
+        batch = reviews[i:i + batch_size]
+        if not batch:
+            continue
+        key = batch_key(batch)
+        if key in completed:
+            continue
+
+        print(f"\n🔄 İşleniyor: Yorum {i+1} - {i+len(batch)} arası")
+        prompt = build_prompt(batch)
+
+        results = None
+        for attempt in range(1, MAX_RETRIES + 1):
+            output, latency, ok = run_model(prompt)
+
+            if ok:
+                results = parse_batch_output(output, batch)
+                if results is not None:
+                    # Gecikme yalnızca başarılı çağrılardan ölçülür: anında dönen bir hata
+                    # baseline'ı sıfıra çekip bütün çalıştırmayı gereksiz yere yavaşlatmasın
+                    baseline = latency if baseline is None else min(baseline, latency)
+                    ewma = latency if ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * ewma
+                    break
+                print(f"⚠️ Çıktı ayrıştırılamadı (deneme {attempt}/{MAX_RETRIES}).")
+            else:
+                print(f"⚠️ Model hata verdi (deneme {attempt}/{MAX_RETRIES}).")
+            # Hata durumunda üstel geri çekilme (son denemeden sonra beklemeye gerek yok)
+            if attempt < MAX_RETRIES:
+                time.sleep(min(MAX_PAUSE, 2 ** attempt))
+
+        if results is None:
+            print(f"❌ Batch atlandı, bir sonraki çalıştırmada tekrar denenecek: Yorum {i+1} - {i+len(batch)}")
+            continue
+
+        append_checkpoint(CHECKPOINT_PATH, key, results)
+        completed.add(key)
+        print(f"✅ {len(results)} yorum kaydedildi ({latency:.1f} sn).")
+        print("-" * 80)
+
+        pause = min(MAX_PAUSE, max(0.0, ewma - baseline) * PACE_FACTOR)
+        if pause > 0:
+            time.sleep(pause)
+
 
-    time.sleep(1)
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,17 @@
 import logging
+import os
 import uuid
 import json
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import List, Dict, Any
 from collections import defaultdict, Counter
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import KMeans
 
 # Proje ayarları (veritabanı bağlantı dizesi ve model ismi burada tanımlı)
 from app.core.config import settings
 # LLM (dil modeli) ile etkileşim sağlayan servis sınıfı ve çıkacak veriyi tanımlayan model
-from main import LLMService, ReviewFields
+from main import LLMService
+from records import AnalysisRecord
 
 # Loglama formatı ayarlanıyor
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,15 +20,33 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # SummaryClusterer Sınıfı
 # ==============================================================================
 class SummaryClusterer:
+    EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
     def __init__(self, dsn: str):
         self.dsn = dsn
-        self.model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+        self._model = None
+
+    @property
+    def model(self):
+        # sentence_transformers (torch) içe aktarımı ve model yüklemesi saniyeler sürer;
+        # yalnızca ilk gerçek kümelemede yapılır.
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.EMBEDDING_MODEL)
+        return self._model
 
-    def fetch_fields_for_product(self, product_id: str) -> dict:
-        product_fields = defaultdict(list)
+    def fetch_fields_for_product(self, product_id: str) -> tuple[dict, int]:
+        """
+        Ürünün tüm analizlerindeki ifadeleri alan bazında sayar; (alan → Counter, analiz edilmiş yorum sayısı) döner.
+        Satırlar sunucu taraflı (named) cursor ile itersize'lık parçalar halinde akar;
+        istemcide yalnızca tekil ifadelerin sayaçları tutulur, bellek ürün boyutuyla büyümez.
+        """
+        product_fields = defaultdict(Counter)
+        row_count = 0
         try:
             with psycopg2.connect(self.dsn) as conn:
-                with conn.cursor() as cur:
+                with conn.cursor(name=f"fields_{uuid.uuid4().hex}") as cur:
+                    cur.itersize = settings.DB_ITERSIZE
                     query = """
                     SELECT ra.pros, ra.cons, ra.complaints, ra.suggestions
                     FROM review_analysis ra
@@ -36,24 +54,31 @@ class SummaryClusterer:
                     WHERE rr.product_id = %s;
                     """
                     cur.execute(query, (product_id,))
-                    rows = cur.fetchall()
-                    if not rows:
+                    for row in cur:
+                        row_count += 1
+                        for field, phrases in zip(("pros", "cons", "complaints", "suggestions"), row):
+                            if phrases:
+                                product_fields[field].update(
+                                    p.strip().lower() for p in phrases if p and p.strip()
+                                )
+                    if row_count == 0:
                         logging.warning(f"Product ID '{product_id}' için analiz edilmiş yorum bulunamadı.")
-                        return {}
-                    for pros, cons, complaints, suggestions in rows:
-                        if pros: product_fields["pros"].extend(pros)
-                        if cons: product_fields["cons"].extend(cons)
-                        if complaints: product_fields["complaints"].extend(complaints)
-                        if suggestions: product_fields["suggestions"].extend(suggestions)
+                        return {}, 0
         except psycopg2.Error as e:
+            # Akışın ortasında kopan bağlantı eksik sayaç bırakır: iyi bir özetin üzerine yazılmasın
             logging.error(f"Veritabanı hatası (fetch_fields_for_product): {e}")
-        return product_fields
+            return {}, 0
+        return product_fields, row_count
 
-    def cluster_and_count_phrases(self, phrases: list[str], n_clusters=10, top_k=5) -> dict:
-        phrases = [p.strip().lower() for p in phrases if p and p.strip()]
+    def cluster_and_count_phrases(self, phrases, n_clusters=10, top_k=5) -> dict:
+        """`phrases` bir ifade listesi veya ifade → adet sayacı (Counter) olabilir."""
+        if not isinstance(phrases, Counter):
+            phrases = Counter(p.strip().lower() for p in phrases if p and p.strip())
         if not phrases: return {}
-        unique_phrases = list(set(phrases))
-        if len(unique_phrases) < 2: return dict(Counter(phrases).most_common(top_k))
+        unique_phrases = list(phrases)
+        if len(unique_phrases) < 2: return dict(phrases.most_common(top_k))
+        from sklearn.cluster import KMeans
+
         embeddings = self.model.encode(unique_phrases)
         cluster_count = min(n_clusters, len(unique_phrases))
         kmeans = KMeans(n_clusters=cluster_count, random_state=42, n_init='auto')
@@ -61,12 +86,10 @@ class SummaryClusterer:
         cluster_map = defaultdict(list)
         for label, phrase in zip(labels, unique_phrases):
             cluster_map[label].append(phrase)
-        phrase_to_cluster_rep = {}
+        counts = Counter()
         for cluster_id, phrases_in_cluster in cluster_map.items():
             representative = min(phrases_in_cluster, key=len)
-            for phrase in phrases_in_cluster:
-                phrase_to_cluster_rep[phrase] = representative
-        counts = Counter([phrase_to_cluster_rep[p] for p in phrases])
+            counts[representative] += sum(phrases[p] for p in phrases_in_cluster)
         return dict(counts.most_common(top_k))
 
     def update_product_summary(self, product_id: str, summary: dict):
@@ -94,16 +117,16 @@ class SummaryClusterer:
 
     def run(self, product_id: str):
         logging.info(f"'{product_id}' ID'li ürün için özetleme işlemi başlatılıyor...")
-        product_fields = self.fetch_fields_for_product(product_id)
-        if not product_fields:
+        product_fields, total_reviews_count = self.fetch_fields_for_product(product_id)
+        if not total_reviews_count:
             logging.warning(f"'{product_id}' için işlenecek veri bulunamadı. Özetleme atlanıyor.")
             return
-        total_reviews_count = sum(len(v) for v in product_fields.values())
+        # total_reviews: analiz edilmiş yorum sayısı (önceden toplam ifade sayısıydı)
         summary = {
-            "pros": self.cluster_and_count_phrases(product_fields.get("pros", [])),
-            "cons": self.cluster_and_count_phrases(product_fields.get("cons", [])),
-            "complaints": self.cluster_and_count_phrases(product_fields.get("complaints", [])),
-            "suggestions": self.cluster_and_count_phrases(product_fields.get("suggestions", [])),
+            "pros": self.cluster_and_count_phrases(product_fields.get("pros", Counter())),
+            "cons": self.cluster_and_count_phrases(product_fields.get("cons", Counter())),
+            "complaints": self.cluster_and_count_phrases(product_fields.get("complaints", Counter())),
+            "suggestions": self.cluster_and_count_phrases(product_fields.get("suggestions", Counter())),
             "total_reviews": total_reviews_count,
         }
         self.update_product_summary(product_id, summary)
@@ -117,7 +140,20 @@ class DatabaseService:
         self.conn = psycopg2.connect(dsn)
         self.conn.autocommit = True
 
-    def insert_raw_reviews(self, reviews: list[dict]):
+    def _stream(self, query: str, params: tuple):
+        """
+        Sorgu sonucunu sunucu taraflı (named) cursor ile itersize'lık parçalar
+        halinde satır satır üretir; sonuç istemcide topluca belleğe alınmaz.
+        Bağlantı autocommit olduğundan cursor WITH HOLD açılır.
+        """
+        with self.conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=RealDictCursor,
+                              withhold=True) as cur:
+            cur.itersize = settings.DB_ITERSIZE
+            cur.execute(query, params)
+            yield from cur
+
+    def insert_raw_reviews(self, reviews: list[dict]) -> bool:
+        """Yorumları ekler (var olanlar atlanır); yazma başarılıysa True döner."""
         try:
             with self.conn.cursor() as cur:
                 cur.executemany(
@@ -133,10 +169,17 @@ class DatabaseService:
                     reviews
                 )
                 logging.info(f"Inserted {cur.rowcount} new reviews.")
+            return True
         except Exception as e:
             logging.error(f"Failed to insert reviews: {e}")
+            return False
 
     def get_pending_reviews(self, product_id: str, limit: int = 50) -> list[dict]:
+        """
+        Analizi yapılmamış ilk `limit` yorumu id sırasıyla çeker (main_workflow'un tek dilimi).
+        Sonuç `limit` ile sınırlı olduğundan düz cursor yeterli; tüm bekleyenleri
+        sınırlı bellekle işlemek için iter_pending_reviews (drain.py) kullanılır.
+        """
         query = """
             SELECT rr.id, rr.comment
             FROM raw_reviews rr
@@ -153,32 +196,90 @@ class DatabaseService:
             logging.error(f"Failed to fetch pending reviews for product_id {product_id}: {e}")
             return []
 
-    def save_analysis_result(self, review_id: uuid.UUID, analysis_data: ReviewFields):
+    def count_pending_reviews(self, product_id: str) -> int:
+        query = """
+            SELECT COUNT(*)
+            FROM raw_reviews rr
+            LEFT JOIN review_analysis ra ON rr.id = ra.review_id
+            WHERE ra.review_id IS NULL AND rr.product_id = %s;
+        """
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(query, (product_id,))
+                return cur.fetchone()[0]
+        except Exception as e:
+            logging.error(f"Failed to count pending reviews for product_id {product_id}: {e}")
+            return 0
+
+    def save_analysis_result(self, review_id: uuid.UUID, analysis_data: AnalysisRecord) -> bool:
+        """Analizi kaydeder; yazma başarılıysa True döner."""
         query = """
             INSERT INTO review_analysis (review_id, sentiment, pros,
                                        cons, complaints, suggestions, expectations, feature_categories)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
         """
-        data = analysis_data.model_dump()
         try:
             with self.conn.cursor() as cur:
-                cur.execute(query, (
-                    review_id, data.get('sentiment'), json.dumps(data.get('pros'), ensure_ascii=False),
-                    json.dumps(data.get('cons'), ensure_ascii=False), json.dumps(data.get('complaints'), ensure_ascii=False),
-                    json.dumps(data.get('suggestions'), ensure_ascii=False), json.dumps(data.get('expectations'), ensure_ascii=False),
-                    json.dumps(data.get('feature_categories'), ensure_ascii=False)
-                ))
+                cur.execute(query, (review_id, *analysis_data.to_db_params()))
                 logging.info(f"Saved analysis for review_id: {review_id}")
+                return True
         except Exception as e:
             logging.error(f"Failed to save analysis result for review_id {review_id}: {e}")
+            return False
+
+    def iter_analysed_comments(self, product_id: str):
+        """Ürünün analizi yapılmış yorumlarını (yakın-kopya indeksi kurmak için) akış halinde üretir."""
+        query = """
+            SELECT rr.id, rr.comment
+            FROM raw_reviews rr
+            JOIN review_analysis ra ON rr.id = ra.review_id
+            WHERE rr.product_id = %s;
+        """
+        try:
+            yield from self._stream(query, (product_id,))
+        except Exception as e:
+            logging.error(f"Failed to fetch analysed comments for product_id {product_id}: {e}")
+
+    def iter_pending_reviews(self, product_id: str):
+        """
+        Ürünün analizi yapılmamış tüm yorumlarını id sırasıyla akış halinde üretir.
+        Sorgu hataları yutulmaz: boş bir akış "bekleyen iş yok" anlamına gelir.
+        """
+        query = """
+            SELECT rr.id, rr.comment
+            FROM raw_reviews rr
+            LEFT JOIN review_analysis ra ON rr.id = ra.review_id
+            WHERE ra.review_id IS NULL AND rr.product_id = %s
+            ORDER BY rr.id;
+        """
+        yield from self._stream(query, (product_id,))
+
+    def copy_analysis_result(self, source_review_id, review_id) -> bool:
+        """Yakın-kopya yorumun analizini LLM'e gitmeden kaynak yorumun analizinden kopyalar."""
+        query = """
+            INSERT INTO review_analysis (review_id, sentiment, pros,
+                                       cons, complaints, suggestions, expectations, feature_categories)
+            SELECT %s, sentiment, pros, cons, complaints, suggestions, expectations, feature_categories
+            FROM review_analysis
+            WHERE review_id = %s;
+        """
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(query, (review_id, source_review_id))
+                logging.info(f"Reused analysis of {source_review_id} for review_id: {review_id}")
+                return cur.rowcount == 1
+        except Exception as e:
+            logging.error(f"Failed to copy analysis result for review_id {review_id}: {e}")
+            return False
 
 # ==============================================================================
 # Yardımcı Fonksiyonlar ve Ana İş Akışı
 # ==============================================================================
 # GÜNCELLEME: Fonksiyon artık işlenecek ürünün ID'sini parametre olarak alıyor.
-def fetch_reviews_from_local(path: str, target_product_id: str) -> List[Dict[str, Any]]:
+def fetch_reviews_from_local(path: str, target_product_id: str | None) -> List[Dict[str, Any]]:
     """
     JSON dosyasından yorumları okur ve sadece 'target_product_id' ile eşleşenleri alır.
+    `target_product_id` None ise dosyadaki tüm ürünlerin yorumları kendi ID'leriyle döner.
     """
     logging.info(f"Loading reviews from local JSON: {path} for product_id: {target_product_id}")
     try:
@@ -201,7 +302,7 @@ def fetch_reviews_from_local(path: str, target_product_id: str) -> List[Dict[str
             
             # YENİ: JSON'daki 'identifier' ile hedef ID'yi karşılaştır.
             item_identifier = item.get("subject", {}).get("identifier")
-            if item_identifier != target_product_id:
+            if target_product_id is not None and item_identifier != target_product_id:
                 continue  # Eşleşmiyorsa bu yorumu atla.
 
             if not item.get("comment"):
@@ -210,7 +311,7 @@ def fetch_reviews_from_local(path: str, target_product_id: str) -> List[Dict[str
             raw_reviews.append({
                 "id": item.get("id"),
                 # YENİ: Veri bütünlüğü için manuel olarak belirtilen ID'yi kullan.
-                "product_id": target_product_id,
+                "product_id": target_product_id or item_identifier,
                 "rating_code": item.get("rating", {}).get("code"),
                 "title": item.get("title", ""),
                 "comment": item.get("comment", ""),
@@ -229,26 +330,38 @@ def fetch_reviews_from_local(path: str, target_product_id: str) -> List[Dict[str
         logging.error(f"Error reading local reviews: {e}")
         return []
 
-def main_workflow():
-    """Yorumları yükler, veritabanına ekler, işlenmemişleri LLM ile analiz eder ve sonucu tekrar veritabanına yazar."""
+# Tek ürünlük çalıştırmada varsayılanlar; çoklu ürün için cli.py kullanılır.
+DEFAULT_PRODUCT_ID = "8883139"
+DEFAULT_JSON_PATH = "C:/Users/SEVVAL/Desktop/workflow/8883139_kazak.json"
+
+def main_workflow(product_id: str = DEFAULT_PRODUCT_ID, json_path: str = DEFAULT_JSON_PATH, full: bool = False):
+    """
+    Yorumları yükler, veritabanına ekler, işlenmemişleri LLM ile analiz eder ve sonucu tekrar veritabanına yazar.
+    Yükleme artımlıdır (ingest_ledger.py): değişmemiş döküm okunmaz, değişmişse yalnızca yeni yorumlar eklenir.
+    `full=True` defteri yok sayıp dökümün tamamını gönderir.
+    """
+    from ingest_ledger import ingest_dumps
+
     db_service = DatabaseService(settings.DATABASE_URL)
     llm_service = LLMService()
 
-    # YENİ: İşlemek istediğiniz ürünün ID'sini ve JSON dosyasının yolunu burada belirtin.
-    TARGET_PRODUCT_ID = "8883139"  # Burayı analiz etmek istediğiniz ürünün ID'si ile değiştirin.
-    LOCAL_JSON_PATH = "C:/Users/SEVVAL/Desktop/workflow/8883139_kazak.json"
+    TARGET_PRODUCT_ID = product_id
+    LOCAL_JSON_PATH = json_path
 
     logging.info(f"--- PHASE 1: FETCHING REVIEWS FOR PRODUCT_ID '{TARGET_PRODUCT_ID}' FROM {LOCAL_JSON_PATH} ---")
+    if not os.path.isfile(LOCAL_JSON_PATH):
+        logging.error(f"HATA: Belirtilen JSON dosyası bulunamadı: {LOCAL_JSON_PATH}")
+        return
     # GÜNCELLEME: Fonksiyona hedef ID parametre olarak veriliyor.
-    fetched_reviews = fetch_reviews_from_local(LOCAL_JSON_PATH, target_product_id=TARGET_PRODUCT_ID)
+    found_products = ingest_dumps([LOCAL_JSON_PATH], db_service, settings.DATABASE_URL,
+                                  only_products={TARGET_PRODUCT_ID}, full=full)
 
-    if not fetched_reviews:
-        logging.warning("JSON dosyasında belirtilen ürün ID'sine ({TARGET_PRODUCT_ID}) ait hiç yorum bulunamadı veya dosya okunamadı. İş akışı durduruluyor.")
+    if TARGET_PRODUCT_ID not in found_products:
+        logging.warning(f"JSON dosyasında belirtilen ürün ID'sine ({TARGET_PRODUCT_ID}) ait hiç yorum bulunamadı veya dosya okunamadı. İş akışı durduruluyor.")
         return
 
     # Otomatik ID alımına artık gerek yok, her şey manuel ID üzerinden yürüyor.
     logging.info(f"Target Product ID for this workflow is set to: {TARGET_PRODUCT_ID}")
-    db_service.insert_raw_reviews(fetched_reviews)
     
     logging.info(f"--- PHASE 2: PROCESSING PENDING REVIEWS FOR PRODUCT: {TARGET_PRODUCT_ID} ---")
     pending_reviews = db_service.get_pending_reviews(product_id=TARGET_PRODUCT_ID) 
@@ -262,12 +375,13 @@ def main_workflow():
             review_id, comment_text = review['id'], review['comment']
             try:
                 analysis_result = llm_service.analyse_review(comment_text)
-                if analysis_result:
-                    db_service.save_analysis_result(review_id, analysis_result)
+                if not analysis_result:
+                    failed += 1
+                    logging.warning(f"Analysis for review_id {review_id} returned None.")
+                elif db_service.save_analysis_result(review_id, analysis_result):
                     success += 1
                 else:
                     failed += 1
-                    logging.warning(f"Analysis for review_id {review_id} returned None.")
             except Exception as e:
                 failed += 1
                 logging.error(f"Critical error during processing of review_id {review_id}: {e}")
@@ -282,4 +396,33 @@ def main_workflow():
     logging.info(f"Failed to analyze: {failed}")
 
 if __name__ == "__main__":
-    main_workflow()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Yorum analizi iş akışı")
+    parser.add_argument("--drain", action="store_true",
+                        help="Bekleyen tüm yorumları sürekli işleyen uzun soluklu mod")
+    parser.add_argument("--product", action="append", dest="products",
+                        help="Drain modunda işlenecek ürün ID'si (birden fazla verilebilir)")
+    parser.add_argument("--workers", type=int, default=1, help="Eşzamanlı LLM analiz işçisi sayısı")
+    parser.add_argument("--page-size", type=int, default=50, help="Veritabanından tek seferde çekilen yorum sayısı")
+    parser.add_argument("--queue-size", type=int, default=100, help="Aşamalar arası kuyruk kapasitesi")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="İş kalmayınca yeniden kontrol aralığı (sn)")
+    parser.add_argument("--once", action="store_true", help="Bekleyen iş bitince çık")
+    parser.add_argument("--full", action="store_true",
+                        help="Yükleme defterini yok say ve dökümün tamamını gönder")
+    args = parser.parse_args()
+
+    if args.drain:
+        from drain import DrainRunner
+
+        DrainRunner(
+            settings.DATABASE_URL,
+            product_ids=args.products or [DEFAULT_PRODUCT_ID],
+            workers=args.workers,
+            page_size=args.page_size,
+            queue_size=args.queue_size,
+            poll_interval=args.poll_interval,
+            once=args.once,
+        ).run()
+    else:
+        main_workflow(full=args.full)
@@ -0,0 +1,50 @@
+# bench_generation.py
+# Şema kısıtlı üretimin etkisini ölçer: aynı yorum örneği önce serbest
+# `format="json"` ile, sonra `ReviewFields` şeması + token sınırıyla analiz edilir.
+# Kullanım: python bench_generation.py 8883139_kazak.json --limit 30
+
+import argparse
+import json
+import logging
+
+from main import LLMService
+
+
+def load_comments(path: str, limit: int) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    reviews = data["reviews"] if isinstance(data, dict) else data
+    comments = [r.get("comment", "").strip() for r in reviews if isinstance(r, dict)]
+    return [c for c in comments if c][:limit]
+
+
+def run(comments: list[str], constrained: bool) -> dict:
+    service = LLMService(constrained=constrained)
+    valid = sum(1 for c in comments if service.analyse_review(c) is not None)
+    return {
+        "mode": "schema" if constrained else "json",
+        "reviews": len(comments),
+        "valid": valid,
+        "avg_tokens": service.stats.avg_tokens,
+        "avg_latency": service.stats.avg_latency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serbest JSON ve şema kısıtlı üretimi karşılaştırır.")
+    parser.add_argument("dump", help="Yorum dökümü (JSON)")
+    parser.add_argument("--limit", type=int, default=30, help="Ölçülecek yorum sayısı")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    comments = load_comments(args.dump, args.limit)
+
+    results = [run(comments, constrained=False), run(comments, constrained=True)]
+
+    print(f"{'mode':<8}{'reviews':>9}{'valid':>7}{'avg tokens':>12}{'avg latency (s)':>17}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['reviews']:>9}{r['valid']:>7}{r['avg_tokens']:>12.1f}{r['avg_latency']:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_records.py
+# Sonuç başına doğrulama + serileştirme maliyetini karşılaştırır (100k sentetik LLM çıktısı):
+#   eski yol: ReviewFields.model_validate_json → model_dump() → altı json.dumps
+#   yeni yol: AnalysisRecord.from_model_output → to_db_params()
+# Kullanım: python bench_records.py [--n 100000]
+
+import argparse
+import json
+import random
+import time
+
+from main import ReviewFields
+from records import FEATURE_CATEGORIES, LIST_FIELDS, SENTIMENTS, AnalysisRecord, orjson
+
+WORDS = ["kaliteli", "rahat", "hafif", "pahalı", "dar kalıp", "hızlı kargo", "sıcak tutuyor",
+         "rengi soluk", "dikişleri sağlam", "beden küçük", "fiyatına göre iyi", "yumuşak"]
+
+
+def synthetic_outputs(n: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    outputs = []
+    for _ in range(n):
+        data = {"sentiment": rng.choice(SENTIMENTS)}
+        for field in LIST_FIELDS:
+            pool = FEATURE_CATEGORIES if field == "feature_categories" else WORDS
+            data[field] = rng.sample(pool, rng.randint(0, 4))
+        outputs.append(json.dumps(data, ensure_ascii=False))
+    return outputs
+
+
+def old_path(text: str) -> tuple:
+    data = ReviewFields.model_validate_json(text).model_dump()
+    return (data.get('sentiment'), json.dumps(data.get('pros'), ensure_ascii=False),
+            json.dumps(data.get('cons'), ensure_ascii=False), json.dumps(data.get('complaints'), ensure_ascii=False),
+            json.dumps(data.get('suggestions'), ensure_ascii=False), json.dumps(data.get('expectations'), ensure_ascii=False),
+            json.dumps(data.get('feature_categories'), ensure_ascii=False))
+
+
+def new_path(text: str) -> tuple:
+    return AnalysisRecord.from_model_output(text).to_db_params()
+
+
+def measure(fn, outputs: list[str]) -> float:
+    started = time.perf_counter()
+    for text in outputs:
+        fn(text)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sonuç başına çözme/serileştirme maliyetini ölçer.")
+    parser.add_argument("--n", type=int, default=100_000)
+    args = parser.parse_args()
+
+    outputs = synthetic_outputs(args.n)
+    # İki yol aynı veritabanı parametrelerini üretmeli (JSON metinleri anlamca eşit)
+    for text in outputs[:1000]:
+        a, b = old_path(text), new_path(text)
+        assert a[0] == b[0] and [json.loads(x) for x in a[1:]] == [json.loads(x) for x in b[1:]]
+
+    print(f"{args.n} synthetic outputs, orjson={'yes' if orjson is not None else 'no'}")
+    print(f"{'path':<6}{'total (s)':>11}{'per result (µs)':>17}")
+    for name, fn in (("old", old_path), ("new", new_path)):
+        elapsed = measure(fn, outputs)
+        print(f"{name:<6}{elapsed:>11.2f}{elapsed / args.n * 1e6:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
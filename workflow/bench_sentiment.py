@@ -0,0 +1,303 @@
+# bench_sentiment.py
+# Duygu sınıflandırma arka uçlarını aynı etiketli veri üzerinde karşılaştırır:
+#   ollama    – LLMService (Ollama, üretimdeki tam analiz istemi)
+#   gguf      – LLMService (llama.cpp GGUF işçi havuzu, aynı istem)
+#   bert      – savasy/bert-base-turkish-sentiment-cased (denemeler/bert1.ipynb)
+#   tfidf_lr  – TF-IDF + LogisticRegression (denemeler/mistral_lr.ipynb), k-katlı çapraz doğrulama
+# Her arka uç ayrı bir süreçte çalışır (bellek ölçümü ve model yüklemeleri birbirine
+# karışmaz); --jobs > 1 iken süreçler paralel yürür. Sonuç tek bir tabloda:
+# doğruluk, makro-F1, yorum/sn, p95 gecikme, CPU-saniye başına yorum ve tepe bellek.
+#
+# Etiketler: 0 = nötr, 1 = pozitif, 2 = negatif
+#
+# Kullanım:
+#   python bench_sentiment.py ../Mistral7B_turkish/etiketli_yorumlar_mistral.json
+#   python bench_sentiment.py ../Mistral7B_turkish/etiketli_yorumlar_mistral.json \
+#       --backend bert --backend tfidf_lr --throughput-csv ../Mistral7B_turkish/tum_yorumlar.csv --jobs 2
+
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+LABELS = (0, 1, 2)
+LABEL_NAMES = {0: "nötr", 1: "pozitif", 2: "negatif"}
+# LLMService sentiment değeri → etiket
+SENTIMENT_TO_LABEL = {"neutral": 0, "positive": 1, "negative": 2}
+# savasy/bert-base-turkish-sentiment-cased çıktısı: 0=negatif, 1=nötr, 2=pozitif
+BERT_TO_LABEL = {0: 2, 1: 0, 2: 1}
+
+
+# ----------------------------------------------------------------------
+# Arka uçlar: load() modeli hazırlar, fit() (varsa) eğitir, predict() tek yorum için etiket döner
+# ----------------------------------------------------------------------
+class Backend:
+    name = ""
+    trainable = False
+
+    def load(self):
+        pass
+
+    def fit(self, texts: list[str], labels: list[int]):
+        raise NotImplementedError
+
+    def predict(self, text: str) -> int | None:
+        raise NotImplementedError
+
+
+class LLMBackend(Backend):
+    def __init__(self, llm_backend: str):
+        self.name = llm_backend
+        self.llm_backend = llm_backend
+
+    def load(self):
+        from app.core.config import settings
+        from main import LLMService
+
+        # Her arka uç kendi sürecinde çalıştığından ayarı burada değiştirmek güvenli
+        settings.LLM_BACKEND = self.llm_backend
+        self.service = LLMService()
+        # analyse_review her hatayı yutar (None döner); model sunucusu kapalıysa ya da GGUF yolu
+        # yanlışsa tablo sıfır doğruluklu bir satır göstermesin diye arka uç burada bir kez
+        # doğrudan çağrılır ve hata yükseltilir. Model yüklemesi de böylece ölçüm dışında kalır.
+        if self.llm_backend == "gguf":
+            self.service.pool.generate("ping")
+        else:
+            self.service.hosts.call(lambda llm: (llm.invoke("ping"), 0))
+
+    def predict(self, text):
+        result = self.service.analyse_review(text)
+        return SENTIMENT_TO_LABEL.get(result.sentiment) if result is not None else None
+
+
+class BertBackend(Backend):
+    name = "bert"
+    model_name = "savasy/bert-base-turkish-sentiment-cased"
+
+    def load(self):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name).eval()
+
+    def predict(self, text):
+        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        with self.torch.no_grad():
+            logits = self.model(**inputs).logits
+        return BERT_TO_LABEL[int(logits.argmax(dim=1))]
+
+
+class TfidfLRBackend(Backend):
+    name = "tfidf_lr"
+    trainable = True
+
+    def fit(self, texts, labels):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        self.vectorizer = TfidfVectorizer(max_features=3000, ngram_range=(1, 2))
+        self.model = LogisticRegression(max_iter=1000, class_weight="balanced")
+        self.model.fit(self.vectorizer.fit_transform(texts), labels)
+
+    def predict(self, text):
+        return int(self.model.predict(self.vectorizer.transform([text]))[0])
+
+
+BACKENDS = {
+    "ollama": lambda: LLMBackend("ollama"),
+    "gguf": lambda: LLMBackend("gguf"),
+    "bert": BertBackend,
+    "tfidf_lr": TfidfLRBackend,
+}
+
+
+# ----------------------------------------------------------------------
+# Ölçüm
+# ----------------------------------------------------------------------
+def load_labelled(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        reviews = json.load(f)["reviews"]
+    return [r for r in reviews if isinstance(r.get("label"), int) and r.get("comment", "").strip()]
+
+
+def load_unlabelled(path: str) -> list[str]:
+    # utf-8-sig: tum_yorumlar.csv BOM ile başlıyor
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return [row["comment"].strip() for row in csv.DictReader(f) if row.get("comment", "").strip()]
+
+
+def stratified_folds(labels: list[int], k: int, seed: int) -> list[list[int]]:
+    """Her sınıfı katlara dengeli dağıtan indeks listeleri."""
+    rng = random.Random(seed)
+    folds = [[] for _ in range(k)]
+    for label in LABELS:
+        indices = [i for i, y in enumerate(labels) if y == label]
+        rng.shuffle(indices)
+        for position, i in enumerate(indices):
+            folds[position % k].append(i)
+    return folds
+
+
+def macro_f1(y_true: list[int], y_pred: list[int | None]) -> float:
+    scores = []
+    for label in LABELS:
+        tp = sum(1 for t, p in zip(y_true, y_pred) if t == label and p == label)
+        fp = sum(1 for t, p in zip(y_true, y_pred) if t != label and p == label)
+        fn = sum(1 for t, p in zip(y_true, y_pred) if t == label and p != label)
+        scores.append(2 * tp / (2 * tp + fp + fn) if tp else 0.0)
+    return sum(scores) / len(scores)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+def _child_stat(pid: int) -> tuple[float, float]:
+    """Canlı bir alt sürecin (CPU-saniye, tepe RSS MB) değeri; /proc'tan okunur (Linux)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            hwm = next((int(line.split()[1]) for line in f if line.startswith("VmHWM:")), 0)
+    except OSError:  # süreç bu arada sonlanmış
+        return 0.0, 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"), hwm / 1024
+
+
+def cpu_seconds() -> float:
+    # GGUF modeli GGUFWorkerPool alt süreçlerinde çalışır: canlı alt süreçler /proc'tan,
+    # sonlanmış olanlar RUSAGE_CHILDREN'dan eklenir
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total + sum(_child_stat(p.pid)[0] for p in multiprocessing.active_children())
+
+
+def peak_rss_mb() -> float:
+    # Bu süreç ile canlı alt süreçlerinin tepe belleklerinin toplamı (her GGUF işçisi modeli ayrı tutar)
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux'ta KB
+    return own + sum(_child_stat(p.pid)[1] for p in multiprocessing.active_children())
+
+
+def timed_predictions(backend: Backend, texts: list[str]) -> tuple[list, list[float]]:
+    predictions, latencies = [], []
+    for text in texts:
+        started = time.perf_counter()
+        predictions.append(backend.predict(text))
+        latencies.append(time.perf_counter() - started)
+    return predictions, latencies
+
+
+def evaluate_backend(name: str, labelled: list[dict], extra: list[str], folds: int, seed: int) -> dict:
+    """Alt süreçte çalışır: modeli yükler, etiketli veriyi tahmin eder ve metrikleri döner."""
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    backend = BACKENDS[name]()
+    texts = [r["comment"].strip() for r in labelled]
+    y_true = [r["label"] for r in labelled]
+
+    started = time.perf_counter()
+    backend.load()
+    load_seconds = time.perf_counter() - started
+
+    cpu_before = cpu_seconds()
+    if backend.trainable:
+        # Eğitilen arka uç her yorumu, o yorumu görmemiş bir modelle tahmin eder (k-katlı)
+        y_pred, latencies = [None] * len(texts), [0.0] * len(texts)
+        for test_idx in stratified_folds(y_true, folds, seed):
+            test_set = set(test_idx)
+            train_idx = [i for i in range(len(texts)) if i not in test_set]
+            backend.fit([texts[i] for i in train_idx], [y_true[i] for i in train_idx])
+            predictions, fold_latencies = timed_predictions(backend, [texts[i] for i in test_idx])
+            for i, p, t in zip(test_idx, predictions, fold_latencies):
+                y_pred[i], latencies[i] = p, t
+    else:
+        y_pred, latencies = timed_predictions(backend, texts)
+    # Etiketsiz ek yorumlar yalnızca hız ölçümüne katılır
+    if extra:
+        latencies += timed_predictions(backend, extra)[1]
+    cpu_used = cpu_seconds() - cpu_before
+
+    correct = sum(1 for t, p in zip(y_true, y_pred) if t == p)
+    busy = sum(latencies)
+    return {
+        "backend": name,
+        "reviews": len(texts),
+        "timed_reviews": len(latencies),
+        "unparsed": sum(1 for p in y_pred if p is None),
+        "accuracy": correct / len(texts) if texts else 0.0,
+        "macro_f1": macro_f1(y_true, y_pred),
+        "reviews_per_second": len(latencies) / busy if busy > 0 else 0.0,
+        "p95_latency_ms": percentile(latencies, 95) * 1000,
+        "cpu_seconds": cpu_used,
+        # GGUF işçileri dahil; Ollama'da model ayrı bir sunucuda çalıştığından yalnızca istemci tarafı
+        "reviews_per_cpu_second": len(latencies) / cpu_used if cpu_used > 0 else 0.0,
+        "load_seconds": load_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_table(results: list[dict]):
+    print(f"{'backend':<10}{'n':>5}{'acc':>7}{'macroF1':>9}{'rev/s':>9}{'p95 ms':>9}"
+          f"{'rev/cpu-s':>11}{'load s':>8}{'peak MB':>9}{'unparsed':>10}")
+    for r in sorted(results, key=lambda r: -r.get("macro_f1", -1)):
+        if "error" in r:
+            print(f"{r['backend']:<10}  hata: {r['error']}")
+            continue
+        print(f"{r['backend']:<10}{r['reviews']:>5}{r['accuracy']:>7.3f}{r['macro_f1']:>9.3f}"
+              f"{r['reviews_per_second']:>9.1f}{r['p95_latency_ms']:>9.1f}{r['reviews_per_cpu_second']:>11.1f}"
+              f"{r['load_seconds']:>8.1f}{r['peak_rss_mb']:>9.0f}{r['unparsed']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Duygu arka uçlarının doğruluk/hız karşılaştırması.")
+    parser.add_argument("labelled", help="{'reviews': [{'comment', 'label'}]} biçiminde etiketli JSON")
+    parser.add_argument("--backend", action="append", choices=list(BACKENDS),
+                        help="Çalıştırılacak arka uç (birden fazla verilebilir, varsayılan: hepsi)")
+    parser.add_argument("--throughput-csv", help="Hız ölçümüne eklenecek etiketsiz yorumlar ('comment' sütunu)")
+    parser.add_argument("--limit", type=int, default=None, help="Etiketli yorumların ilk N tanesini kullan")
+    parser.add_argument("--folds", type=int, default=5, help="Eğitilen arka uçlar için kat sayısı")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Paralel süreç sayısı (>1 iken arka uçlar CPU için yarışır; rev/s buna göre okunmalı)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Sonuçların yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    labelled = load_labelled(args.labelled)[:args.limit]
+    extra = load_unlabelled(args.throughput_csv) if args.throughput_csv else []
+    names = args.backend or list(BACKENDS)
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=context, max_tasks_per_child=1) as executor:
+        futures = {name: executor.submit(evaluate_backend, name, labelled, extra, args.folds, args.seed)
+                   for name in names}
+        for name, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:  # eksik paket / model sunucusu kapalı: diğer arka uçlar etkilenmez
+                results.append({"backend": name, "error": f"{type(e).__name__}: {e}"})
+
+    counts = ", ".join(f"{LABEL_NAMES[label]}={sum(1 for r in labelled if r['label'] == label)}" for label in LABELS)
+    print(f"Etiketli yorum: {len(labelled)} ({counts})" + (f", hız için ek yorum: {len(extra)}" if extra else ""))
+    print_table(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
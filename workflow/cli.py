@@ -0,0 +1,131 @@
+# cli.py
+# Katalog ölçeğinde çalıştırma: bir veya daha fazla dizin/glob içindeki ürün
+# dökümlerini bulur, yorumları veritabanına yükler ve tüm ürünleri tek bir
+# drain çalışmasında analiz edip özetler. Kaynak kodda ürün ID'si değiştirmek gerekmez.
+#
+# Örnekler:
+#   python cli.py .                         # bu dizindeki tüm *.json dökümleri
+#   python cli.py "dumps/*_kazak.json"      # glob
+#   python cli.py dumps/ --product 8883139 --product 8569331
+#   python cli.py --product 8883139         # yalnızca veritabanında bekleyenler
+#   python cli.py dumps/ --daemon           # analizi sıcak worker_daemon.py sürecine gönder
+
+import argparse
+import glob
+import logging
+import os
+
+from app.core.config import settings
+from base import DatabaseService
+
+
+def discover_dumps(paths: list[str]) -> list[str]:
+    """Dizin, glob veya dosya yollarından JSON döküm dosyalarının listesini çıkarır."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.json"))))
+        elif any(ch in path for ch in "*?["):
+            files.extend(sorted(glob.glob(path, recursive=True)))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            logging.warning(f"Yol bulunamadı, atlanıyor: {path}")
+    # Aynı dosya birden fazla kez verildiyse tekilleştir (sırayı koru)
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+def ingest(files: list[str], only_products: set[str] | None, full: bool = False) -> list[str]:
+    """
+    Dökümlerdeki yeni yorumları raw_reviews tablosuna ekler; bulunan ürün ID'lerini döner.
+    Değişmemiş dosyalar ve ürün işaretinden eski yorumlar atlanır (ingest_ledger.py).
+    """
+    from ingest_ledger import ingest_dumps
+
+    db_service = DatabaseService(settings.DATABASE_URL)
+    try:
+        return ingest_dumps(files, db_service, settings.DATABASE_URL, only_products, full=full)
+    finally:
+        db_service.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Birden fazla ürün dökümünü yükler, analiz eder ve özetler.")
+    parser.add_argument("paths", nargs="*", help="Döküm dosyaları, dizinler veya glob kalıpları")
+    parser.add_argument("--product", action="append", dest="products",
+                        help="Yalnızca bu ürün ID'lerini işle (birden fazla verilebilir)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Eşzamanlı LLM isteği sayısı (model sunucusunu boş bırakmamak için >= 2)")
+    parser.add_argument("--page-size", type=int, default=10,
+                        help="Her ürün için bir turda kuyruğa alınan yorum sayısı")
+    parser.add_argument("--queue-size", type=int, default=50, help="Aşamalar arası kuyruk kapasitesi")
+    parser.add_argument("--follow", action="store_true",
+                        help="Bekleyen iş bitince çıkma, yeni yorumları beklemeye devam et")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="--follow modunda kontrol aralığı (sn)")
+    parser.add_argument("--no-summary", action="store_true",
+                        help="Özetlemeyi atla (summary_daemon.py bildirimlerle güncelliyorsa)")
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                        help="Yakın-kopya analiz yeniden kullanım eşiği (0 = kapalı, varsayılan: ayarlardan)")
+    parser.add_argument("--full", action="store_true",
+                        help="Yükleme defterini yok say: değişmemiş dosyaları da oku, tüm yorumları gönder")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Analizi bu süreçte değil, çalışan worker_daemon.py'ye gönder (model yükleme yok)")
+    args = parser.parse_args()
+
+    if not args.paths and not args.products:
+        parser.error("En az bir döküm yolu veya --product verilmelidir.")
+
+    only_products = set(args.products) if args.products else None
+    product_ids = []
+    if args.paths:
+        files = discover_dumps(args.paths)
+        logging.info(f"{len(files)} döküm dosyası bulundu.")
+        product_ids = ingest(files, only_products, full=args.full)
+    # Dökümde olmayan ama --product ile verilen ürünler de (veritabanında bekleyenler) işlenir
+    for product_id in args.products or []:
+        if product_id not in product_ids:
+            product_ids.append(product_id)
+
+    if not product_ids:
+        logging.warning("İşlenecek ürün bulunamadı.")
+        return
+
+    options = {
+        "workers": args.workers,
+        "page_size": args.page_size,
+        "queue_size": args.queue_size,
+        "summarise": not args.no_summary,
+        "dedup_threshold": args.dedup_threshold,
+    }
+
+    if args.daemon:
+        from worker_daemon import submit_job
+
+        if args.follow:
+            parser.error("--follow, --daemon ile birlikte kullanılamaz.")
+        try:
+            response = submit_job({"job": "drain", "product_ids": product_ids, **options})
+        except OSError as e:  # FileNotFoundError / ConnectionRefusedError: daemon çalışmıyor
+            logging.error(f"worker_daemon.py'ye bağlanılamadı ({settings.WORKER_SOCKET}): {e}. "
+                          f"Daemon'u 'python worker_daemon.py' ile başlatın veya --daemon olmadan çalıştırın.")
+            return
+        if response.get("status") != "ok":
+            logging.error(f"Daemon işi başarısız: {response.get('error')}")
+            return
+        for row in response["throughput"]:
+            logging.info(f"{row['product_id']}: analysed={row['analysed']}, reused={row['reused']}, "
+                         f"failed={row['failed']}, reviews/min={row['per_minute']:.1f}")
+        return
+
+    from drain import DrainRunner
+
+    DrainRunner(
+        settings.DATABASE_URL,
+        product_ids=product_ids,
+        poll_interval=args.poll_interval,
+        once=not args.follow,
+        **options,
+    ).run()
+
+if __name__ == "__main__":
+    main()
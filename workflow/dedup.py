@@ -0,0 +1,203 @@
+# dedup.py
+# Yakın-kopya yorum tespiti (MinHash + LSH).
+# "Ürün çok güzel" ile "ürün çok güzel!!" gibi yalnızca noktalama, büyük/küçük
+# harf, <br> etiketi veya bir iki kelimeyle ayrışan yorumlar için LLM'i tekrar
+# çağırmak yerine, benzerlik eşiğini geçen komşunun analizi yeniden kullanılır.
+#
+# Etiketli örnek üzerinde doğruluk ölçümü:
+#   python dedup.py ../Mistral7B_turkish/etiketli_yorumlar_mistral.json --threshold 0.85
+
+import argparse
+import json
+import random
+import re
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # numpy opsiyonel; yoksa imza saf Python ile hesaplanır
+    np = None
+
+NUM_PERM = 64          # imza uzunluğu
+BANDS = 16             # LSH bant sayısı (BANDS * ROWS = NUM_PERM)
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3       # karakter n-gram uzunluğu
+# 32 bitlik değerler: (a * h + b) uint64'e sığar, imza 64 × 4 = 256 bayt olarak saklanır
+_PRIME = (1 << 31) - 1
+SIGNATURE_BYTES = NUM_PERM * 4
+_BAND_BYTES = ROWS * 4
+_HASH_MASK = (1 << 64) - 1
+
+# Sabit tohumla üretilen permütasyon katsayıları: imzalar çalıştırmalar arasında tutarlı
+_rng = random.Random(42)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+if np is not None:
+    _A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    _B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_comment(text: str) -> str:
+    """HTML etiketlerini, noktalamayı ve fazla boşlukları atar; Türkçeye uygun küçük harfe çevirir."""
+    text = _TAG_RE.sub(" ", text or "")
+    text = text.replace("İ", "i").replace("I", "ı").lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def shingles(text: str) -> set[str]:
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> bytes | None:
+    """Normalize edilmiş metnin MinHash imzası (64 adet uint32, paketlenmiş); boş metin için None."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    if not hashes:
+        return None
+    if np is not None:
+        h = np.array(hashes, dtype=np.uint64)
+        return ((_A * h + _B) % _PRIME).min(axis=1).astype(np.uint32).tobytes()
+    return array("I", [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]).tobytes()
+
+
+def similarity(sig_a: bytes, sig_b: bytes) -> float:
+    """İki imzadan tahmini Jaccard benzerliği."""
+    if np is not None:
+        return int(np.count_nonzero(np.frombuffer(sig_a, np.uint32) == np.frombuffer(sig_b, np.uint32))) / NUM_PERM
+    return sum(1 for x, y in zip(memoryview(sig_a).cast("I"), memoryview(sig_b).cast("I")) if x == y) / NUM_PERM
+
+
+class _HashTable:
+    """Sıralı (hash, kayıt no) dizileri: dict + liste yerine eşleme başına 12 bayt."""
+    __slots__ = ("hashes", "entries")
+
+    def __init__(self):
+        self.hashes = array("Q")
+        self.entries = array("I")
+
+    def add(self, h: int, entry: int):
+        pos = bisect_right(self.hashes, h)
+        self.hashes.insert(pos, h)
+        self.entries.insert(pos, entry)
+
+    def get(self, h: int):
+        lo = bisect_left(self.hashes, h)
+        return self.entries[lo:bisect_right(self.hashes, h, lo)]
+
+
+class NearDuplicateIndex:
+    """
+    Anahtar (ör. review_id) → imza eşlemesi ve LSH bantları üzerinden aday araması.
+    İmzalar tek bir bytearray'de, bant ve birebir-metin anahtarları sıralı dizilerde
+    tutulur; kayıt başına bellek ~0,5 KB (büyük ürünlerde de sınırlı kalır).
+    """
+
+    def __init__(self, threshold: float = 0.85):
+        self.threshold = threshold
+        self._keys: list = []
+        self._signatures = bytearray()
+        self._exact = _HashTable()          # normalize metin hash'i → kayıt (birebir kopyalar için)
+        self._bands = [_HashTable() for _ in range(BANDS)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _band_hash(signature: bytes, band: int) -> int:
+        return hash(signature[band * _BAND_BYTES:(band + 1) * _BAND_BYTES]) & _HASH_MASK
+
+    def add(self, key, text: str):
+        normalized = normalize_comment(text)
+        signature = minhash(normalized)
+        if signature is None:
+            return
+        band_hashes = [self._band_hash(signature, band) for band in range(BANDS)]
+        with self._lock:
+            entry = len(self._keys)
+            self._keys.append(key)
+            self._signatures += signature
+            self._exact.add(hash(normalized) & _HASH_MASK, entry)
+            for table, h in zip(self._bands, band_hashes):
+                table.add(h, entry)
+
+    def query(self, text: str):
+        """Eşiği geçen en benzer anahtarı ve benzerliği döner; yoksa (None, 0.0)."""
+        normalized = normalize_comment(text)
+        with self._lock:
+            exact = self._exact.get(hash(normalized) & _HASH_MASK)
+            if exact:
+                return self._keys[exact[0]], 1.0
+        signature = minhash(normalized)
+        if signature is None:
+            return None, 0.0
+        band_hashes = [self._band_hash(signature, band) for band in range(BANDS)]
+
+        best_key, best_score = None, 0.0
+        with self._lock:
+            candidates = set()
+            for table, h in zip(self._bands, band_hashes):
+                candidates.update(table.get(h))
+            for entry in candidates:
+                stored = self._signatures[entry * SIGNATURE_BYTES:(entry + 1) * SIGNATURE_BYTES]
+                score = similarity(signature, stored)
+                if score > best_score:
+                    best_key, best_score = self._keys[entry], score
+        if best_score >= self.threshold:
+            return best_key, best_score
+        return None, best_score
+
+
+def evaluate(labelled: list[dict], threshold: float) -> dict:
+    """
+    Etiketli yorumları sırayla işler: eşleşen komşu varsa onun etiketi yeniden
+    kullanılır (LLM çağrısı atlanmış sayılır), yoksa yorum indekse eklenir.
+    Yeniden kullanılan etiketlerin gerçek etiketle uyuşma oranını raporlar.
+    """
+    index = NearDuplicateIndex(threshold)
+    labels = {}
+    reused = correct = 0
+    for i, review in enumerate(labelled):
+        key, _ = index.query(review["comment"])
+        if key is not None:
+            reused += 1
+            correct += labels[key] == review["label"]
+        else:
+            index.add(i, review["comment"])
+            labels[i] = review["label"]
+    return {
+        "reviews": len(labelled),
+        "llm_calls_avoided": reused,
+        "avoided_ratio": reused / len(labelled) if labelled else 0.0,
+        "reuse_accuracy": correct / reused if reused else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yakın-kopya yeniden kullanımını etiketli örnek üzerinde ölçer.")
+    parser.add_argument("labelled", help="{'reviews': [{'comment', 'label'}]} biçiminde etiketli JSON")
+    parser.add_argument("--threshold", type=float, action="append",
+                        help="Benzerlik eşiği (birden fazla verilebilir)")
+    args = parser.parse_args()
+
+    with open(args.labelled, "r", encoding="utf-8") as f:
+        labelled = [r for r in json.load(f)["reviews"] if isinstance(r.get("label"), int)]
+
+    print(f"{'threshold':>10}{'reviews':>9}{'avoided':>9}{'avoided %':>11}{'reuse acc.':>12}")
+    for threshold in args.threshold or [0.7, 0.8, 0.85, 0.9, 1.0]:
+        r = evaluate(labelled, threshold)
+        accuracy = f"{r['reuse_accuracy']:.3f}" if r["reuse_accuracy"] is not None else "-"
+        print(f"{threshold:>10.2f}{r['reviews']:>9}{r['llm_calls_avoided']:>9}"
+              f"{100 * r['avoided_ratio']:>10.1f}%{accuracy:>12}")
+
+
+if __name__ == "__main__":
+    main()
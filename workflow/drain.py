@@ -0,0 +1,345 @@
+# drain.py
+# Bekleyen yorumları tek bir 50'lik dilim yerine sürekli işleyen uzun soluklu mod.
+# Üç aşama ayrı thread'lerde çalışır ve sınırlı kuyruklarla bağlanır:
+#   fetch (sunucu taraflı cursor'dan sayfa sayfa) → analiz (LLM) → yazma (review_analysis)
+# Kuyruk dolduğunda önceki aşama bekler (backpressure). SIGINT/SIGTERM gelince
+# yeni iş alınmaz, analizi bitmiş sonuçlar yazılır ve çıkılır. Bir ürünün
+# bekleyen işi bitip tüm sonuçları yazıldığında özetleme o ürün için bir kez çalışır.
+# Birden fazla ürün verildiğinde fetch aşaması ürünler arasında sayfa sayfa
+# sırayla (round-robin) dolaşır; büyük ürünler küçükleri bekletmez.
+# Analizden önce her yorum ürünün yakın-kopya indeksinde aranır (dedup.py);
+# eşiği geçen bir komşusu varsa LLM çağrılmadan komşunun analizi kopyalanır.
+
+import logging
+import queue
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from app.core.config import settings
+from base import DatabaseService, SummaryClusterer
+from dedup import NearDuplicateIndex
+from main import LLMService
+
+# Kuyruklarda aşamanın bittiğini bildiren işaret
+_DONE = object()
+
+
+class DrainRunner:
+    def __init__(self, dsn: str, product_ids: list[str], llm_service: LLMService | None = None,
+                 workers: int = 1, page_size: int = 50, queue_size: int = 100,
+                 poll_interval: float = 30.0, once: bool = False, progress_every: int = 25,
+                 summarise: bool = True, dedup_threshold: float | None = None,
+                 clusterer: SummaryClusterer | None = None, on_progress=None):
+        self.dsn = dsn
+        self.product_ids = list(product_ids)
+        self.llm_service = llm_service or LLMService()
+        self.workers = workers
+        self.page_size = page_size
+        self.poll_interval = poll_interval
+        self.once = once
+        self.progress_every = progress_every
+        # summary_daemon.py çalışıyorsa özetleme ona bırakılabilir
+        self.summarise = summarise
+        self.dedup_threshold = settings.DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+        self._indexes: dict[str, NearDuplicateIndex] = {}
+
+        self.stop_event = threading.Event()
+        self._fetch_done = threading.Event()   # fetch aşaması çıktı (başarılı ya da hatayla)
+        self.error = None                      # bir aşama hatayla durduysa hata mesajı
+        self.work_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue(maxsize=queue_size)
+
+        self._lock = threading.Lock()
+        self._in_flight = Counter()      # çekilmiş ama henüz yazılmamış yorumlar
+        self._exhausted = set()          # bu turda bekleyen işi kalmayan ürünler
+        self._dirty = set()              # son özetten beri yeni analiz yazılan ürünler
+        self._queued_ids = set()         # kuyrukta veya analizde olan yorumlar (tekrar çekilmez)
+        self._failed_ids = set()         # bu oturumda analizi başarısız olanlar (tekrar çekilmez)
+        self.success = Counter()
+        self.failed = Counter()
+        self.reused = Counter()          # yakın-kopya sayesinde atlanan LLM çağrıları
+        self._first_seen = {}            # ürün için ilk yorumun kuyruğa girdiği an
+        self._last_write = {}            # ürün için son sonucun yazıldığı an
+
+        # Sıcak tutulan bir kümeleyici verilebilir (worker_daemon.py)
+        self._clusterer = clusterer
+        # Her sonuç yazıldıktan sonra ürün ID'siyle çağrılır (jobs.py ilerleme bildirimi)
+        self.on_progress = on_progress
+        self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        # Yakın-kopya indeksleri fetch thread'ini bekletmeden arka planda doldurulur
+        self._index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup-index")
+
+    # ------------------------------------------------------------------
+    # Ortak yardımcılar
+    # ------------------------------------------------------------------
+    def request_stop(self, signum=None, frame=None):
+        if not self.stop_event.is_set():
+            logging.info("Durdurma isteği alındı; yeni iş alınmıyor, işlenenler yazılıyor...")
+        self.stop_event.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Kuyruk doluysa bekler; durdurma istenirse vazgeçer."""
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _maybe_summarise(self, product_id: str):
+        """Ürünün bekleyen işi bittiyse ve yeni analiz yazıldıysa özetlemeyi bir kez tetikler."""
+        if not self.summarise:
+            return
+        with self._lock:
+            ready = (product_id in self._exhausted and self._in_flight[product_id] == 0
+                     and product_id in self._dirty)
+            if ready:
+                self._dirty.discard(product_id)
+        if ready:
+            self._summary_executor.submit(self._summarise, product_id)
+
+    def _summarise(self, product_id: str):
+        try:
+            if self._clusterer is None:
+                self._clusterer = SummaryClusterer(self.dsn)
+            self._clusterer.run(product_id=product_id)
+        except Exception as e:
+            logging.error(f"Summary failed for product_id {product_id}: {e}")
+
+    # ------------------------------------------------------------------
+    # Aşamalar
+    # ------------------------------------------------------------------
+    def _fetch_stage(self):
+        db = None
+        try:
+            # Bağlantı try içinde açılır: başarısız olsa bile analiz işçilerine _DONE gönderilir
+            db = DatabaseService(self.dsn)
+            while not self.stop_event.is_set():
+                with self._lock:
+                    self._exhausted.clear()
+                # Her ürün için sunucu taraflı cursor'dan akan bir üreteç; her turda her
+                # aktif üründen bir sayfa alınır: LLM kapasitesi ürünler arasında adil paylaşılır
+                streams = {product_id: db.iter_pending_reviews(product_id) for product_id in self.product_ids}
+                try:
+                    while streams and not self.stop_event.is_set():
+                        for product_id in list(streams):
+                            if not self._fetch_page(product_id, streams[product_id]):
+                                del streams[product_id]
+                            if self.stop_event.is_set():
+                                break
+                finally:
+                    for stream in streams.values():
+                        stream.close()
+                if self.once or self.stop_event.is_set():
+                    break
+                # Bekleyen iş kalmadı; yeni yorumlar için bir süre sonra tekrar bak
+                self.stop_event.wait(self.poll_interval)
+        except Exception as e:
+            logging.error(f"Fetch stage failed, stopping drain: {e}")
+            self.error = self.error or f"fetch: {e}"
+            self.request_stop()
+        finally:
+            if db is not None:
+                db.conn.close()
+            self._fetch_done.set()
+            for _ in range(self.workers):
+                self.work_queue.put(_DONE)
+
+    def _fetch_page(self, product_id: str, stream) -> bool:
+        """Ürünün bir sonraki sayfasını kuyruğa koyar; bekleyen iş kalmadıysa False döner."""
+        page = list(islice(stream, self.page_size))
+        if not page:
+            with self._lock:
+                self._exhausted.add(product_id)
+            self._maybe_summarise(product_id)
+            return False
+        if self.dedup_threshold > 0 and product_id not in self._indexes:
+            # İndeks hemen kaydedilir ve doldurulurken de sorgulanır/yazma aşamasınca beslenir;
+            # dolana kadar eşleşmeyen yorumlar yalnızca LLM'e gider
+            self._indexes[product_id] = NearDuplicateIndex(self.dedup_threshold)
+            self._index_executor.submit(self._build_index, product_id, self._indexes[product_id])
+        for review in page:
+            with self._lock:
+                if review["id"] in self._failed_ids or review["id"] in self._queued_ids:
+                    continue
+                self._queued_ids.add(review["id"])
+                self._in_flight[product_id] += 1
+                self._first_seen.setdefault(product_id, time.monotonic())
+            if not self._put(self.work_queue, (product_id, review)):
+                break
+        return True
+
+    def _build_index(self, product_id: str, index: NearDuplicateIndex):
+        db = None
+        try:
+            db = DatabaseService(self.dsn)
+            stream = db.iter_analysed_comments(product_id)
+            try:
+                for row in stream:
+                    if self.stop_event.is_set():
+                        return
+                    index.add(row["id"], row["comment"])
+            finally:
+                stream.close()
+            logging.info(f"[{product_id}] near-duplicate index built with {len(index)} analysed reviews.")
+        except Exception as e:
+            logging.error(f"[{product_id}] near-duplicate index build failed: {e}")
+        finally:
+            if db is not None:
+                db.conn.close()
+
+    def _analysis_stage(self):
+        while True:
+            try:
+                item = self.work_queue.get(timeout=0.5)
+            except queue.Empty:
+                # Fetch aşaması bitmiş ve durdurma istenmişse beklemeye gerek yok
+                if self.stop_event.is_set() and self._fetch_done.is_set():
+                    break
+                continue
+            if item is _DONE:
+                break
+            if self.stop_event.is_set():
+                # Henüz başlanmamış iş bırakılır; veritabanında bekleyen olarak kalır
+                continue
+            product_id, review = item
+            try:
+                index = self._indexes.get(product_id)
+                source_id, _ = index.query(review["comment"]) if index is not None else (None, 0.0)
+                analysis = None if source_id is not None else self.llm_service.analyse_review(review["comment"])
+            except Exception as e:
+                logging.error(f"Analysis stage error for review_id {review['id']}: {e}")
+                source_id, analysis = None, None
+            # Yazma aşaması sonuna kadar (hata durumunda da) kuyruğu tükettiğinden burada
+            # bloklamak güvenli; durdurma sırasında da analizi bitmiş sonuç kaybolmaz.
+            self.result_queue.put((product_id, review, analysis, source_id))
+
+    def _write_stage(self):
+        db = None
+        try:
+            db = DatabaseService(self.dsn)
+            while True:
+                item = self.result_queue.get()
+                if item is _DONE:
+                    break
+                product_id, review, analysis, source_id = item
+                review_id = review["id"]
+                saved = False
+                reused = source_id is not None and db.copy_analysis_result(source_id, review_id)
+                if source_id is not None and not reused and not db.conn.closed:
+                    # Kaynak analiz kopyalanamadı (satır yok veya yazılamadı): yorum yine de
+                    # LLM'e gider, aksi halde bu oturum boyunca hiç analiz edilmezdi
+                    logging.info(f"Reuse of {source_id} failed, analysing review_id {review_id} with the LLM.")
+                    try:
+                        analysis = self.llm_service.analyse_review(review["comment"])
+                    except Exception as e:
+                        logging.error(f"Analysis stage error for review_id {review_id}: {e}")
+                if reused:
+                    saved = True
+                    self.reused[product_id] += 1
+                    self.success[product_id] += 1
+                elif analysis is not None and db.save_analysis_result(review_id, analysis):
+                    saved = True
+                    self.success[product_id] += 1
+                    if product_id in self._indexes:
+                        self._indexes[product_id].add(review_id, review["comment"])
+                else:
+                    with self._lock:
+                        self._failed_ids.add(review_id)
+                    self.failed[product_id] += 1
+                    if analysis is None:
+                        logging.warning(f"Analysis for review_id {review_id} returned None.")
+                    elif db.conn.closed:
+                        # Bağlantı koptu: sonraki tüm yazmalar da kaybolur, drain hata ile durdurulur
+                        raise RuntimeError(f"database connection lost while saving review_id {review_id}")
+                with self._lock:
+                    self._queued_ids.discard(review_id)
+                    self._in_flight[product_id] -= 1
+                    self._last_write[product_id] = time.monotonic()
+                    if saved:
+                        self._dirty.add(product_id)
+                self._log_progress(product_id)
+                if self.on_progress is not None:
+                    self.on_progress(product_id)
+                self._maybe_summarise(product_id)
+        except Exception as e:
+            logging.error(f"Write stage failed, stopping drain: {e}")
+            self.error = self.error or f"write: {e}"
+            self.request_stop()
+            # Analiz işçileri result_queue'da bloklanmasın: kalan sonuçlar _DONE gelene kadar tüketilir
+            while self.result_queue.get() is not _DONE:
+                pass
+        finally:
+            if db is not None:
+                db.conn.close()
+
+    def _log_progress(self, product_id: str):
+        done = self.success[product_id] + self.failed[product_id]
+        if done % self.progress_every == 0:
+            logging.info(f"[{product_id}] analysed={self.success[product_id]}, "
+                         f"reused={self.reused[product_id]}, failed={self.failed[product_id]}, in_flight={self._in_flight[product_id]}")
+
+    def throughput_rows(self) -> list[dict]:
+        """Ürün başına işlenen yorum sayısı, süre ve dakikadaki yorum sayısı."""
+        rows = []
+        for product_id in self.product_ids:
+            started = self._first_seen.get(product_id)
+            finished = self._last_write.get(product_id)
+            elapsed = (finished - started) if started is not None and finished is not None else 0.0
+            rows.append({
+                "product_id": product_id,
+                "analysed": self.success[product_id],
+                "reused": self.reused[product_id],
+                "failed": self.failed[product_id],
+                "seconds": elapsed,
+                "per_minute": self.success[product_id] * 60 / elapsed if elapsed > 0 else 0.0,
+            })
+        return rows
+
+    def log_throughput_table(self):
+        rows = self.throughput_rows()
+        logging.info("----- DRAIN SUMMARY -----")
+        logging.info(f"{'product_id':<14}{'analysed':>10}{'reused':>8}{'failed':>8}{'seconds':>10}{'reviews/min':>13}")
+        for r in rows:
+            logging.info(f"{r['product_id']:<14}{r['analysed']:>10}{r['reused']:>8}{r['failed']:>8}"
+                         f"{r['seconds']:>10.1f}{r['per_minute']:>13.1f}")
+        total = sum(r["analysed"] for r in rows)
+        if self._first_seen and self._last_write:
+            wall = max(self._last_write.values()) - min(self._first_seen.values())
+            if wall > 0:
+                logging.info(f"{'TOTAL':<14}{total:>10}{sum(r['reused'] for r in rows):>8}"
+                             f"{sum(r['failed'] for r in rows):>8}{wall:>10.1f}{total * 60 / wall:>13.1f}")
+        logging.info("'reused' = yakın-kopya sayesinde atlanan LLM çağrısı sayısı")
+        hosts = self.llm_service.host_metrics()
+        if len(hosts) > 1:
+            logging.info("----- OLLAMA HOSTS -----")
+            self.llm_service.hosts.log_metrics()
+
+    # ------------------------------------------------------------------
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.request_stop)
+            signal.signal(signal.SIGTERM, self.request_stop)
+
+        logging.info(f"--- DRAIN MODE: products={self.product_ids}, workers={self.workers} ---")
+        fetcher = threading.Thread(target=self._fetch_stage, name="fetch")
+        analysers = [threading.Thread(target=self._analysis_stage, name=f"analyse-{i}")
+                     for i in range(self.workers)]
+        writer = threading.Thread(target=self._write_stage, name="write")
+
+        for t in [fetcher, writer, *analysers]:
+            t.start()
+        # join(timeout) döngüsü ana thread'in sinyalleri alabilmesini sağlar
+        for t in [fetcher, *analysers]:
+            while t.is_alive():
+                t.join(timeout=0.5)
+        self.result_queue.put(_DONE)
+        writer.join()
+        self._summary_executor.shutdown(wait=True)
+        self._index_executor.shutdown(wait=True)
+        self.log_throughput_table()
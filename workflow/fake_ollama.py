@@ -0,0 +1,116 @@
+# fake_ollama.py
+# Yük dağıtımını (ollama_pool.py) model olmadan denemek için sahte Ollama sunucuları.
+# /api/tags ve /api/chat (akışlı NDJSON ve tek yanıt) uç noktalarını taklit eder;
+# her yanıt ReviewFields şemasına uyan sabit bir JSON'dur. Gecikme, sapma ve hata
+# oranı ayarlanabilir; aynı süreçte birden fazla port dinlenebilir.
+#
+# Örnek: iki hızlı ve bir yavaş sunucu
+#   python fake_ollama.py --port 11501 --port 11502 --latency 0.5 &
+#   python fake_ollama.py --port 11503 --latency 1.5 --fail-rate 0.2 &
+#   OLLAMA_BASE_URLS='["http://localhost:11501","http://localhost:11502","http://localhost:11503"]' \
+#       python cli.py --product 8883139 --workers 6
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSE = {
+    "sentiment": "positive",
+    "pros": ["kaliteli", "rahat"],
+    "cons": [],
+    "complaints": [],
+    "suggestions": [],
+    "expectations": ["uzun ömürlü olması"],
+    "feature_categories": ["material quality"],
+}
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": self.server.model, "model": self.server.model}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+        if random.random() < server.fail_rate:
+            self._send_json(500, {"error": "simulated failure"})
+            return
+
+        content = json.dumps(RESPONSE, ensure_ascii=False)
+        created = datetime.now(timezone.utc).isoformat()
+        done = {"model": body.get("model", server.model), "created_at": created,
+                "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop",
+                "total_duration": int(server.latency * 1e9), "prompt_eval_count": 200,
+                "eval_count": len(content) // 4, "eval_duration": int(server.latency * 1e9)}
+        if not body.get("stream", True):
+            done["message"]["content"] = content
+            self._send_json(200, done)
+            return
+
+        # Akış: yaklaşık token büyüklüğünde parçalar, sonda done=true satırı
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for i in range(0, len(content), 4):
+                chunk = {"model": done["model"], "created_at": created,
+                         "message": {"role": "assistant", "content": content[i:i + 4]}, "done": False}
+                self.wfile.write((json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.write((json.dumps(done) + "\n").encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # istemci akışı erken kapattı (artımlı doğrulama)
+
+
+def serve(port: int, latency: float, jitter: float, fail_rate: float, model: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), _FakeOllamaHandler)
+    server.daemon_threads = True
+    server.latency, server.jitter, server.fail_rate, server.model = latency, jitter, fail_rate, model
+    threading.Thread(target=server.serve_forever, name=f"fake-ollama-{port}", daemon=True).start()
+    logging.info(f"Fake Ollama listening on http://127.0.0.1:{port} (latency={latency}s, fail_rate={fail_rate})")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sahte Ollama sunucuları başlatır.")
+    parser.add_argument("--port", type=int, action="append", help="Dinlenecek port (birden fazla verilebilir)")
+    parser.add_argument("--latency", type=float, default=0.5, help="Ortalama yanıt süresi (sn)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Yanıt süresinin standart sapması (sn)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="HTTP 500 dönen isteklerin oranı")
+    parser.add_argument("--model", default="qwen3:14b")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    servers = [serve(port, args.latency, args.jitter, args.fail_rate, args.model)
+               for port in args.port or [11501]]
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# gguf_backend.py
+# llama.cpp (llama_cpp.Llama) ile GGUF modelini süreç içinde çalıştıran arka uç.
+# Her işçi süreç modeli bir kez yükler, kendi çekirdeklerine sabitlenir ve
+# sabit prompt önekinin (talimatlar + FEATURE_CATEGORIES) KV durumunu bir kez
+# hesaplayıp saklar; her çağrıda yalnızca yorum metni değerlendirilir.
+
+import atexit
+import json
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Mistral instruct sohbet biçimi
+INST_OPEN = "[INST] "
+INST_CLOSE = " [/INST]"
+
+# İşçi süreç içindeki durum (her süreçte bir kez doldurulur)
+_llm = None
+_prefix_state = None
+_grammar = None
+_stream_spec = None
+
+
+def _pick_cores(worker_index: int, n_threads: int) -> list[int]:
+    """İşçinin sırasına göre kullanılabilir çekirdeklerden ardışık bir dilim seçer."""
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if not available:
+        return []
+    start = (worker_index * n_threads) % len(available)
+    return [available[(start + i) % len(available)] for i in range(min(n_threads, len(available)))]
+
+
+def _worker_init(counter, model_path: str, n_ctx: int, n_threads: int, prefix: str,
+                 json_schema: dict | None, stream_spec: dict | None):
+    global _llm, _prefix_state, _grammar, _stream_spec
+
+    with counter.get_lock():
+        worker_index = counter.value
+        counter.value += 1
+
+    cores = _pick_cores(worker_index, n_threads)
+    if cores:
+        os.sched_setaffinity(0, cores)
+
+    from llama_cpp import Llama, LlamaGrammar
+
+    _llm = Llama(
+        model_path=model_path,
+        n_ctx=n_ctx,
+        n_threads=n_threads,
+        n_threads_batch=n_threads,
+        n_gpu_layers=0,
+        verbose=False,
+    )
+
+    # Şema verildiyse üretim bu şemadan türetilen grammar ile sınırlanır
+    if json_schema is not None:
+        _grammar = LlamaGrammar.from_json_schema(json.dumps(json_schema), verbose=False)
+
+    _stream_spec = stream_spec
+
+    # Sabit öneki bir kez değerlendir ve KV durumunu sakla
+    _llm.eval(_llm.tokenize(prefix.encode("utf-8")))
+    _prefix_state = _llm.save_state()
+    logger.info(f"GGUF worker {worker_index} ready on cores {cores} (prefix tokens: {_prefix_state.n_tokens})")
+
+
+def _worker_generate(prompt: str, max_tokens: int, temperature: float) -> tuple[str | None, int]:
+    # Önek durumuna geri dön; create_completion ortak öneki tekrar değerlendirmez
+    _llm.load_state(_prefix_state)
+    if _stream_spec is not None:
+        return _worker_generate_stream(prompt, max_tokens, temperature)
+    output = _llm.create_completion(
+        prompt=prompt,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        grammar=_grammar,
+    )
+    return output["choices"][0]["text"], output["usage"]["completion_tokens"]
+
+
+def _worker_generate_stream(prompt: str, max_tokens: int, temperature: float) -> tuple[str | None, int]:
+    # Token token üret; JSON kapanınca veya geçersizleşince üretimi durdur
+    from streaming import COMPLETE, PARTIAL, IncrementalJsonValidator
+
+    validator = IncrementalJsonValidator(**_stream_spec)
+    tokens = 0
+    stream = _llm.create_completion(
+        prompt=prompt,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        grammar=_grammar,
+        stream=True,
+    )
+    try:
+        for chunk in stream:
+            tokens += 1
+            if validator.feed(chunk["choices"][0]["text"]) != PARTIAL:
+                break
+    finally:
+        stream.close()
+    return (validator.text if validator.status == COMPLETE else None), tokens
+
+
+class GGUFWorkerPool:
+    """GGUF modelini N işçi süreçte bellekte tutan havuz."""
+
+    def __init__(self, model_path: str, prompt_prefix: str, prompt_suffix: str,
+                 workers: int = 1, n_threads: int = 4, n_ctx: int = 2048,
+                 json_schema: dict | None = None, max_tokens: int = 512,
+                 stream_spec: dict | None = None):
+        self.max_tokens = max_tokens
+        self.prefix = INST_OPEN + prompt_prefix
+        self.suffix = prompt_suffix + INST_CLOSE
+        ctx = mp.get_context("spawn")
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_worker_init,
+            initargs=(ctx.Value("i", 0), model_path, n_ctx, n_threads, self.prefix, json_schema, stream_spec),
+        )
+        atexit.register(self.close)
+        logger.info(f"GGUFWorkerPool started: {workers} worker(s) x {n_threads} thread(s), model: {model_path}")
+
+    def generate(self, review_text: str, temperature: float = 0.7) -> tuple[str, int]:
+        """
+        Yorumu işçilerden birinde çalıştırır; (ham metin, üretilen token sayısı) döner.
+        Akış modunda çıktı şemaya uyamaz hale gelirse metin None olur.
+        """
+        prompt = self.prefix + review_text + self.suffix
+        return self.executor.submit(_worker_generate, prompt, self.max_tokens, temperature).result()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
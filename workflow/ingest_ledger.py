@@ -0,0 +1,217 @@
+# ingest_ledger.py
+# Artımlı yükleme: her çalıştırmada dökümün tamamını okuyup bütün satırları
+# insert_raw_reviews'e gönderip ON CONFLICT DO NOTHING'e güvenmek yerine
+#   - ingest_files: yüklenen dosyaların parmak izi (boyut, mtime, sha256) ve
+#     içerdiği ürünler. Boyut ve mtime aynıysa dosya hiç açılmaz; değişmişse
+#     sha256 karşılaştırılır (yalnızca dokunulmuş ama içeriği aynı dosya da atlanır).
+#   - ingest_watermarks: ürün başına en yeni (publisherDate, review id). Daha önce
+#     yüklenmiş bir dosya değişmişse (günlük, sona eklenen döküm) ondan yalnızca bu
+#     işaretten sonraki yorumlar gönderilir; maliyet yalnızca yeni yorumlarla orantılıdır.
+# Defterin hiç görmediği dosyalar (ör. aynı ürünün daha eski bir sayfası) işarete
+# bakılmadan tamamen gönderilir; tekrarları ON CONFLICT DO NOTHING ayıklar.
+
+import hashlib
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import psycopg2
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ingest_files (
+    path         TEXT NOT NULL,
+    scope        TEXT NOT NULL,              -- '*' (tüm ürünler) veya yalnızca alınan ürün ID'leri (virgülle)
+    size         BIGINT NOT NULL,
+    mtime_ns     BIGINT NOT NULL,
+    sha256       TEXT NOT NULL,
+    product_ids  TEXT[] NOT NULL,
+    records      BIGINT NOT NULL,            -- son yüklemede dosyadan okunan yorum sayısı
+    ingested_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (path, scope)
+);
+
+CREATE TABLE IF NOT EXISTS ingest_watermarks (
+    product_id      TEXT PRIMARY KEY,
+    publisher_date  TIMESTAMPTZ NOT NULL,
+    review_id       TEXT NOT NULL,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parse_date(value) -> datetime | None:
+    try:
+        parsed = datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+    # Saat dilimi olmayan tarihler UTC kabul edilir (veritabanındaki timestamptz ile karşılaştırılabilsin)
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _scope(only_products) -> str:
+    return ",".join(sorted(only_products)) if only_products else "*"
+
+
+class IngestLedger:
+    def __init__(self, dsn: str):
+        self.conn = psycopg2.connect(dsn)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute(SCHEMA_SQL)
+        self._watermarks: dict[str, tuple | None] = {}
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------------------------------
+    # Dosya parmak izleri
+    # ------------------------------------------------------------------
+    def check_file(self, path: str, scope: str) -> tuple[bool, dict, list[str] | None]:
+        """(değişmedi mi, parmak izi, kayıtlı ürün ID'leri) döner; dosya hiç yüklenmemişse ID'ler None'dır."""
+        stat = os.stat(path)
+        fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": None}
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT size, mtime_ns, sha256, product_ids FROM ingest_files WHERE path = %s AND scope = %s;",
+                        (path, scope))
+            row = cur.fetchone()
+        if row is None:
+            return False, fingerprint, None
+        size, mtime_ns, sha256, product_ids = row
+        if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+            return True, fingerprint, product_ids
+        fingerprint["sha256"] = _sha256(path)
+        if fingerprint["sha256"] == sha256:
+            # İçerik aynı, yalnızca mtime değişmiş: bir dahaki sefere hash bile hesaplanmasın
+            with self.conn.cursor() as cur:
+                cur.execute("UPDATE ingest_files SET size = %s, mtime_ns = %s WHERE path = %s AND scope = %s;",
+                            (stat.st_size, stat.st_mtime_ns, path, scope))
+            return True, fingerprint, product_ids
+        return False, fingerprint, product_ids
+
+    def record_file(self, path: str, scope: str, fingerprint: dict, product_ids: list[str], records: int):
+        sha256 = fingerprint["sha256"] or _sha256(path)
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO ingest_files (path, scope, size, mtime_ns, sha256, product_ids, records)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (path, scope) DO UPDATE SET
+                    size = EXCLUDED.size, mtime_ns = EXCLUDED.mtime_ns, sha256 = EXCLUDED.sha256,
+                    product_ids = EXCLUDED.product_ids, records = EXCLUDED.records,
+                    ingested_at = NOW();
+                """,
+                (path, scope, fingerprint["size"], fingerprint["mtime_ns"], sha256, list(product_ids), records),
+            )
+
+    # ------------------------------------------------------------------
+    # Ürün başına yüksek su işareti (publisher_date, review id)
+    # ------------------------------------------------------------------
+    def watermark(self, product_id: str) -> tuple | None:
+        if product_id not in self._watermarks:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT publisher_date, review_id FROM ingest_watermarks WHERE product_id = %s;",
+                            (product_id,))
+                row = cur.fetchone()
+            self._watermarks[product_id] = tuple(row) if row else None
+        return self._watermarks[product_id]
+
+    def new_records(self, product_id: str, reviews: list[dict]) -> list[dict]:
+        """İşaretten sonraki yorumlar; tarihi olmayanlar her zaman gönderilir (ON CONFLICT ayıklar)."""
+        mark = self.watermark(product_id)
+        if mark is None:
+            return reviews
+        fresh = []
+        for review in reviews:
+            published = _parse_date(review.get("publisher_date"))
+            if published is None or (published, str(review["id"])) > mark:
+                fresh.append(review)
+        return fresh
+
+    def advance(self, product_id: str, reviews: list[dict]):
+        """Başarıyla yazılan yorumlara göre ürünün işaretini ileri taşır (asla geri almaz)."""
+        keys = [(d, str(r["id"])) for r in reviews if (d := _parse_date(r.get("publisher_date"))) is not None]
+        if not keys:
+            return
+        published, review_id = max(keys)
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO ingest_watermarks AS w (product_id, publisher_date, review_id)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (product_id) DO UPDATE SET
+                    publisher_date = EXCLUDED.publisher_date, review_id = EXCLUDED.review_id, updated_at = NOW()
+                WHERE (EXCLUDED.publisher_date, EXCLUDED.review_id) > (w.publisher_date, w.review_id);
+                """,
+                (product_id, published, review_id),
+            )
+        current = self._watermarks.get(product_id)
+        if current is None or (published, review_id) > current:
+            self._watermarks[product_id] = (published, review_id)
+
+
+def ingest_dumps(files: list[str], db_service, dsn: str, only_products: set[str] | None = None,
+                 full: bool = False) -> list[str]:
+    """
+    Dökümlerdeki yeni yorumları raw_reviews'e ekler; dökümlerde bulunan ürün ID'lerini döner
+    (değişmediği için atlanan dosyaların ürünleri dahil: bekleyen analizleri olabilir).
+    `full=True` defteri yok sayar ve tüm yorumları gönderir (ON CONFLICT ile).
+    """
+    from base import fetch_reviews_from_local
+
+    scope = _scope(only_products)
+    ledger = IngestLedger(dsn)
+    try:
+        products = []
+        by_product = defaultdict(list)  # yeni dosyalardan: tamamı gönderilir
+        appended = defaultdict(list)    # daha önce yüklenmiş, değişmiş dosyalardan: işarete göre süzülür
+        changed = []  # (yol, parmak izi, dosyadaki ürünler, okunan yorum sayısı)
+        for path in files:
+            path = os.path.abspath(path)
+            unchanged, fingerprint, known = ledger.check_file(path, scope)
+            if unchanged and not full:
+                logging.info(f"Döküm değişmemiş, atlanıyor: {path}")
+                products.extend(known)
+                continue
+            # Tek ürünlük kapsamda eşleştirme okuma sırasında yapılır (diğer ürünler hiç kurulmaz)
+            target = next(iter(only_products)) if only_products and len(only_products) == 1 else None
+            bucket = appended if known is not None and not full else by_product
+            file_products, records = [], 0
+            for review in fetch_reviews_from_local(path, target_product_id=target):
+                product_id = review["product_id"]
+                if product_id and (only_products is None or product_id in only_products):
+                    if product_id not in file_products:
+                        file_products.append(product_id)
+                    bucket[product_id].append(review)
+                    records += 1
+            if file_products:
+                changed.append((path, fingerprint, file_products, records))
+                products.extend(file_products)
+
+        for product_id in dict.fromkeys([*by_product, *appended]):
+            fresh = by_product[product_id]
+            if product_id in appended:
+                fresh = fresh + ledger.new_records(product_id, appended[product_id])
+            total = len(by_product[product_id]) + len(appended[product_id])
+            logging.info(f"--- INGEST: {len(fresh)} new of {total} reviews for product_id '{product_id}' ---")
+            if fresh and not db_service.insert_raw_reviews(fresh):
+                # Yazılamadı: işaret ve dosya kaydı ilerletilmez, bir sonraki çalıştırmada tekrar denenir
+                changed = [c for c in changed if product_id not in c[2]]
+                continue
+            ledger.advance(product_id, fresh)
+
+        for path, fingerprint, file_products, records in changed:
+            ledger.record_file(path, scope, fingerprint, file_products, records)
+        return list(dict.fromkeys(products))
+    finally:
+        ledger.close()
@@ -0,0 +1,167 @@
+# jobs.py
+# api_server.py için arka plan analiz işleri.
+# Bir iş; döküm(ler)i raw_reviews'e yükler, bekleyen yorumları DrainRunner ile
+# analiz eder ve ürün özetini günceller. İşler API sürecinde değil, ayrı bir
+# süreç havuzunda çalışır: LLM/gömme modeli yüklemesi ve analiz, API isteklerinin
+# gecikmesini etkilemez. İlerleme, Manager sözlüğü üzerinden API sürecine taşınır
+# ve oradan Server-Sent Events ile istemciye akıtılır.
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.config import settings
+
+# İş durumları
+QUEUED, INGESTING, ANALYSING, DONE, FAILED = "queued", "ingesting", "analysing", "done", "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+# İşçi süreç başına bir kez oluşturulup işler arasında sıcak tutulan servisler
+_llm_service = None
+_clusterer = None
+
+
+def _init_worker():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _publish(progress, job_id: str, **changes):
+    # Manager sözlüğündeki iç içe değişiklikler yayılmaz; kayıt her seferinde bütün olarak yazılır
+    snapshot = dict(progress[job_id])
+    snapshot.update(changes)
+    progress[job_id] = snapshot
+
+
+def _run_job(job_id: str, progress, product_id: str | None, dump_paths: list[str]):
+    """İşçi süreçte çalışır: yükleme → analiz (+ özetleme) ve ilerleme bildirimi."""
+    global _llm_service, _clusterer
+    from base import DatabaseService, SummaryClusterer
+    from cli import ingest
+    from drain import DrainRunner
+    from main import LLMService
+
+    try:
+        _publish(progress, job_id, status=INGESTING, started_at=time.time())
+        product_ids = [product_id] if product_id else []
+        if dump_paths:
+            found = ingest(dump_paths, {product_id} if product_id else None)
+            product_ids = list(dict.fromkeys(product_ids + found))
+        if not product_ids:
+            raise ValueError("Dökümde ürün ID'si olan yorum bulunamadı.")
+
+        db = DatabaseService(settings.DATABASE_URL)
+        try:
+            total = sum(db.count_pending_reviews(p) for p in product_ids)
+        finally:
+            db.conn.close()
+
+        if _llm_service is None:
+            _llm_service = LLMService()
+            _clusterer = SummaryClusterer(settings.DATABASE_URL)
+        _publish(progress, job_id, status=ANALYSING, product_ids=product_ids, pending=total)
+
+        analysis_started = time.monotonic()
+        runner = DrainRunner(settings.DATABASE_URL, product_ids=product_ids, llm_service=_llm_service,
+                             clusterer=_clusterer, workers=settings.JOB_LLM_CONCURRENCY,
+                             once=True)
+
+        def on_progress(_product_id):
+            analysed = sum(runner.success.values())
+            failed = sum(runner.failed.values())
+            elapsed = time.monotonic() - analysis_started
+            _publish(progress, job_id,
+                     pending=max(total - analysed - failed, 0),
+                     analysed=analysed,
+                     reused=sum(runner.reused.values()),
+                     failed=failed,
+                     reviews_per_second=(analysed + failed) / elapsed if elapsed > 0 else 0.0)
+
+        runner.on_progress = on_progress
+        runner.run()
+        on_progress(None)
+        if runner.error:
+            raise RuntimeError(f"drain durdu ({runner.error})")
+        _publish(progress, job_id, status=DONE, finished_at=time.time())
+    except Exception as e:
+        logging.error(f"Job {job_id} failed: {e}")
+        _publish(progress, job_id, status=FAILED, error=str(e), finished_at=time.time())
+
+
+class JobManager:
+    """İşleri süreç havuzuna gönderir ve ilerleme kayıtlarını tutar."""
+
+    def __init__(self, workers: int | None = None):
+        # spawn: API sürecinin thread'leri ve açık bağlantıları işçilere kopyalanmaz
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = workers or settings.JOB_WORKERS
+        self._manager = self._context.Manager()
+        self.progress = self._manager.dict()
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=self._context, initializer=_init_worker)
+
+    def _on_done(self, job_id: str, future):
+        # _run_job kendi hatalarını yakalar; buraya gelen hata işçi sürecin ölmesidir (OOM, yerel çökme)
+        if future.cancelled() or future.exception() is None:
+            return
+        try:
+            job = self.get(job_id)
+            if job is not None and job["status"] not in FINISHED_STATES:
+                _publish(self.progress, job_id, status=FAILED, finished_at=time.time(),
+                         error=f"işçi süreç beklenmedik şekilde sonlandı ({future.exception()!r})")
+        except Exception as e:  # Manager kapatılmış olabilir (sunucu kapanırken)
+            logging.error(f"Job {job_id} could not be marked failed: {e}")
+
+    def _prune(self):
+        # Bitmiş işlerin kayıtları JOB_RETENTION_SECONDS sonra silinir; sözlük sınırsız büyümez
+        cutoff = time.time() - settings.JOB_RETENTION_SECONDS
+        for job_id, job in self.progress.items():
+            if job["status"] in FINISHED_STATES and (job["finished_at"] or 0) < cutoff:
+                self.progress.pop(job_id, None)
+
+    def submit(self, product_id: str | None = None, dump_paths: list[str] | None = None) -> str:
+        job_id = uuid.uuid4().hex
+        self.progress[job_id] = {
+            "job_id": job_id,
+            "status": QUEUED,
+            "product_ids": [product_id] if product_id else [],
+            "dumps": [os.path.basename(p) for p in dump_paths or []],
+            "pending": None,
+            "analysed": 0,
+            "reused": 0,
+            "failed": 0,
+            "reviews_per_second": 0.0,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        args = (_run_job, job_id, self.progress, product_id, list(dump_paths or []))
+        with self._lock:
+            self._prune()
+            try:
+                future = self._executor.submit(*args)
+            except BrokenProcessPool:
+                # Bir işçi öldüğünde havuz kalıcı olarak bozulur: yenisi kurulur
+                logging.warning("Job pool is broken, starting a new one.")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                future = self._executor.submit(*args)
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        snapshot = self.progress.get(job_id)
+        return dict(snapshot) if snapshot is not None else None
+
+    def shutdown(self):
+        with self._lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
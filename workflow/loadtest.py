@@ -0,0 +1,299 @@
+# loadtest.py
+# Dashboard API'si (api_server.py) için yük testi.
+# Yerel bir Postgres'e N sentetik ürün ve özeti (analysis_summary + rollup tabloları)
+# ekler, ardından api_server.app'i belirli bir eşzamanlılık ve istek karışımıyla
+# sürer; uç nokta bazında throughput, p50/p95/p99 gecikme ve hata oranını JSON
+# rapor olarak yazar. Raporlar sürümler arasında --compare ile karşılaştırılabilir.
+#
+# Uygulama varsayılan olarak süreç içinde (httpx ASGITransport) çağrılır;
+# --url verilirse çalışan bir uvicorn sunucusuna HTTP üzerinden gidilir.
+#
+# Sentetik veri yazıldığından --dsn zorunludur; uygulamanın kendi veritabanı
+# (DATABASE_URL) yalnızca --allow-app-database ile kabul edilir.
+#
+# Örnekler:
+#   python loadtest.py --dsn postgresql://localhost/loadtest --seed-products 500 --concurrency 32 --duration 30 --out before.json
+#   python loadtest.py --dsn postgresql://localhost/loadtest --concurrency 32 --duration 30 --out after.json --compare before.json
+#   python loadtest.py --dsn postgresql://localhost/loadtest --mix products=1,analysis=4,overview=2 --url http://localhost:8000
+#   python loadtest.py --dsn postgresql://localhost/loadtest --cleanup
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+import httpx
+import psycopg2
+import psycopg2.extras
+
+from app.core.config import settings
+from records import FEATURE_CATEGORIES, dumps
+from rollups import SCHEMA_SQL as ROLLUP_SCHEMA_SQL
+
+# Sentetik ürünler gerçek verilerden bu önekle ayrılır; --cleanup yalnızca bunları siler
+PRODUCT_PREFIX = "loadtest-"
+
+SUMMARY_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS analysis_summary (
+    product_id       TEXT PRIMARY KEY,
+    total_reviews    INTEGER,
+    top_pros         TEXT,
+    top_cons         TEXT,
+    top_complaints   TEXT,
+    top_suggestions  TEXT,
+    last_updated     TIMESTAMPTZ DEFAULT NOW()
+);
+"""
+
+# Uç nokta adı → URL kalıbı (ürün ID'si {pid} yerine yazılır)
+ENDPOINTS = {
+    "products": "/products",
+    "analysis": "/analysis/{pid}",
+    "overview": "/analysis/{pid}/overview",
+    "features": "/analysis/{pid}/features",
+    "trends": "/analysis/{pid}/trends",
+}
+DEFAULT_MIX = "products=1,analysis=6,overview=2,features=1,trends=1"
+
+PHRASES = ["kaliteli", "rahat", "hafif", "pahalı", "dar kalıp", "hızlı kargo", "sıcak tutuyor",
+           "rengi soluk", "dikişleri sağlam", "beden küçük", "fiyatına göre iyi", "yumuşak",
+           "geç geldi", "iade zor", "kumaşı ince", "tam beden"]
+
+
+def product_ids(n: int) -> list[str]:
+    return [f"{PRODUCT_PREFIX}{i:05d}" for i in range(n)]
+
+
+def seed(dsn: str, n_products: int, rng_seed: int = 42):
+    """N sentetik ürün için özet ve rollup satırlarını yazar (tekrar çalıştırılabilir)."""
+    rng = random.Random(rng_seed)
+    summaries, rollups, features, months = [], [], [], []
+    for pid in product_ids(n_products):
+        total = rng.randint(20, 5000)
+        top = {field: dumps({p: rng.randint(1, total) for p in rng.sample(PHRASES, 5)})
+               for field in ("pros", "cons", "complaints", "suggestions")}
+        summaries.append((pid, total, top["pros"], top["cons"], top["complaints"], top["suggestions"]))
+
+        positive = rng.randint(0, total)
+        negative = rng.randint(0, total - positive)
+        rollups.append((pid, total, positive, negative, total - positive - negative,
+                        total * rng.randint(2, 5), total))
+        for feature in rng.sample(FEATURE_CATEGORIES, 8):
+            features.append((pid, feature, rng.randint(1, total)))
+        for m in range(12):
+            count = rng.randint(0, total // 12 + 1)
+            months.append((pid, f"2024-{m + 1:02d}-01", count, count // 2, count // 4,
+                           count - count // 2 - count // 4, count * 4, count))
+
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SUMMARY_SCHEMA_SQL)
+            cur.execute(ROLLUP_SCHEMA_SQL)
+            _delete_synthetic(cur)
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO analysis_summary (product_id, total_reviews, top_pros, top_cons,
+                                              top_complaints, top_suggestions) VALUES %s""", summaries)
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO product_rollup (product_id, analysed_reviews, positive, negative, neutral,
+                                            rating_sum, rating_count) VALUES %s""", rollups)
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO product_feature_rollup (product_id, feature, mentions) VALUES %s""", features)
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO product_monthly_rollup (product_id, month, analysed_reviews, positive, negative,
+                                                    neutral, rating_sum, rating_count) VALUES %s""", months)
+    logging.info(f"{n_products} sentetik ürün eklendi.")
+
+
+def _delete_synthetic(cur):
+    for table in ("analysis_summary", "product_rollup", "product_feature_rollup", "product_monthly_rollup"):
+        cur.execute(f"DELETE FROM {table} WHERE product_id LIKE %s;", (PRODUCT_PREFIX + "%",))
+
+
+def cleanup(dsn: str):
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            _delete_synthetic(cur)
+    logging.info("Sentetik ürünler silindi.")
+
+
+def seeded_products(dsn: str) -> list[str]:
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT product_id FROM analysis_summary WHERE product_id LIKE %s ORDER BY product_id;",
+                        (PRODUCT_PREFIX + "%",))
+            return [row[0] for row in cur.fetchall()]
+
+
+def parse_mix(spec: str) -> dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"bilinmeyen uç nokta: {name!r} (geçerli: {', '.join(ENDPOINTS)})")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """En yakın sıra (nearest-rank) yüzdeliği; boş listede 0."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarise(samples: list[tuple[float, bool]], wall: float) -> dict:
+    latencies = sorted(s[0] for s in samples)
+    errors = sum(1 for s in samples if not s[1])
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "rps": len(samples) / wall if wall > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+async def drive(client: httpx.AsyncClient, products: list[str], mix: dict[str, int], concurrency: int,
+                duration: float, max_requests: int | None, warmup: int, rng_seed: int) -> tuple[dict, float]:
+    """Eşzamanlı istemcilerle istek gönderir; uç nokta başına (gecikme, başarılı mı) örneklerini döner."""
+    names, weights = list(mix), list(mix.values())
+    samples = defaultdict(list)
+    sent = 0
+    deadline = None
+
+    async def request(rng: random.Random, record: bool):
+        name = rng.choices(names, weights)[0]
+        url = ENDPOINTS[name].format(pid=rng.choice(products))
+        started = time.perf_counter()
+        try:
+            response = await client.get(url)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if record:
+            samples[name].append((time.perf_counter() - started, ok))
+
+    async def user(index: int):
+        nonlocal sent
+        rng = random.Random(rng_seed + index)
+        while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+            sent += 1
+            await request(rng, record=True)
+
+    # Isınma: bağlantı/içe aktarma maliyetleri ölçüme karışmasın
+    warm_rng = random.Random(rng_seed - 1)
+    for _ in range(warmup):
+        await request(warm_rng, record=False)
+
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    print(f"{'endpoint':<12}{'requests':>10}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors %':>10}")
+    for name, r in report["endpoints"].items():
+        line = (f"{name:<12}{r['requests']:>10}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}"
+                f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{100 * r['error_rate']:>10.2f}")
+        old = (baseline or {}).get("endpoints", {}).get(name)
+        if old and old["p95_ms"] > 0 and old["rps"] > 0:
+            line += f"   rps {100 * (r['rps'] / old['rps'] - 1):+.0f}%, p95 {100 * (r['p95_ms'] / old['p95_ms'] - 1):+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard API'si için yük testi.")
+    parser.add_argument("--dsn", required=True, help="Sentetik ürünlerin yazılacağı (yerel, test) veritabanı")
+    parser.add_argument("--allow-app-database", action="store_true",
+                        help="--dsn uygulamanın DATABASE_URL'i ile aynı olsa da çalıştır")
+    parser.add_argument("--seed-products", type=int, default=0,
+                        help="Testten önce bu kadar sentetik ürün ekle (0 = mevcut sentetik ürünleri kullan)")
+    parser.add_argument("--cleanup", action="store_true", help="Sentetik ürünleri sil ve çık")
+    parser.add_argument("--url", help="Çalışan sunucunun adresi (verilmezse uygulama süreç içinde çağrılır)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Eşzamanlı sanal kullanıcı sayısı")
+    parser.add_argument("--duration", type=float, default=30.0, help="Ölçüm süresi (sn)")
+    parser.add_argument("--requests", type=int, default=None, help="En fazla istek sayısı (süreden önce dolarsa)")
+    parser.add_argument("--warmup", type=int, default=50, help="Ölçüm dışı ısınma isteği sayısı")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="uç nokta=ağırlık listesi")
+    parser.add_argument("--seed", type=int, default=42, help="İstek dizisi için rastgelelik tohumu")
+    parser.add_argument("--out", help="JSON raporun yazılacağı dosya")
+    parser.add_argument("--compare", help="Karşılaştırma için önceki JSON rapor")
+    args = parser.parse_args()
+    if args.dsn == settings.DATABASE_URL and not args.allow_app_database:
+        # Sentetik ürünler ve özetleri gerçek panelin /products listesine karışmasın
+        parser.error("--dsn uygulamanın DATABASE_URL'i ile aynı; ayrı bir test veritabanı verin "
+                     "veya bilerek --allow-app-database ekleyin.")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.cleanup:
+        cleanup(args.dsn)
+        return
+    if args.seed_products:
+        seed(args.dsn, args.seed_products)
+    products = seeded_products(args.dsn)
+    if not products:
+        parser.error("Sentetik ürün yok; önce --seed-products ile ekleyin.")
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30.0,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        import api_server
+
+        api_server.DATABASE_URL = args.dsn
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api_server.app),
+                                   base_url="http://loadtest", timeout=30.0)
+
+    async def run():
+        async with client:
+            return await drive(client, products, mix, args.concurrency, args.duration,
+                               args.requests, args.warmup, args.seed)
+
+    samples, wall = asyncio.run(run())
+    report = {
+        "revision": git_revision(),
+        "target": args.url or "in-process",
+        "config": {"products": len(products), "concurrency": args.concurrency, "duration": args.duration,
+                   "requests": args.requests, "mix": mix, "seed": args.seed},
+        "wall_seconds": wall,
+        "total": summarise([s for per in samples.values() for s in per], wall),
+        "endpoints": {name: summarise(samples[name], wall) for name in mix if samples[name]},
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    t = report["total"]
+    print(f"TOTAL: {t['requests']} istek, {t['rps']:.1f} istek/sn, p95 {t['p95_ms']:.1f} ms, "
+          f"hata oranı {100 * t['error_rate']:.2f}%")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logging.info(f"Rapor yazıldı: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,136 +1,254 @@
 # main.py
 
 import logging
-from typing import List
+import time
+from typing import Annotated, List, Literal
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import ChatOllama
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+from records import FEATURE_CATEGORIES, MAX_ITEMS_PER_FIELD, MAX_TAG_CHARS, SENTIMENTS, AnalysisRecord
+from streaming import COMPLETE, INVALID, PARTIAL, IncrementalJsonValidator
 
 # Logging ayarları
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Yorumda geçen ürün özelliklerini sınırlı bir listeden seçmek için sabit liste
-FEATURE_CATEGORIES = [
-    "ease of use", "material quality", "pricing", "durability",
-    "delivery speed", "packaging quality", "design aesthetics",
-    "ease of setup", "seller responsiveness", "size compatibility",
-    "product match with listing", "meeting expectations", "eco-friendliness",
-    "availability", "noise level", "battery life", "discount",
-    "payment options", "return process", "spare parts", "warranty",
-    "technical support", "brand trust", "stock issue"
-]
+Sentiment = Literal[SENTIMENTS]
+FeatureCategory = Literal[tuple(FEATURE_CATEGORIES)]
+Tag = Annotated[str, Field(max_length=MAX_TAG_CHARS)]
 
 # Veritabanı Şemasıyla Uyumlu Pydantic Modeli
-# 'review_analysis' tablosunun yapısında
+# 'review_analysis' tablosunun yapısında. Yalnızca modele verilen JSON şemasını
+# üretmek için kullanılır; sonuçların kendisi records.AnalysisRecord ile taşınır.
 class ReviewFields(BaseModel):
     """LLM'den dönecek yapılandırılmış veriyi tanımlar."""
-    sentiment: str = Field(
+    model_config = ConfigDict(extra="forbid")
+
+    sentiment: Sentiment = Field(
         ...,
         description="Genel ton: positive, negative, or neutral"
     )
 
-    pros: List[str] = Field(
+    pros: List[Tag] = Field(
         ...,
+        max_length=MAX_ITEMS_PER_FIELD,
         description="Olumlu yönler (her etiket en fazla 5 kelime)"
     )
-    cons: List[str] = Field(
+    cons: List[Tag] = Field(
         ...,
+        max_length=MAX_ITEMS_PER_FIELD,
         description="Olumsuz yönler (her etiket en fazla 5 kelime)"
     )
-    complaints: List[str] = Field(
+    complaints: List[Tag] = Field(
         ...,
+        max_length=MAX_ITEMS_PER_FIELD,
         description="Üretici tarafından iyileştirilmesi gereken somut sorunlar"
     )
-    suggestions: List[str] = Field(
+    suggestions: List[Tag] = Field(
         ...,
+        max_length=MAX_ITEMS_PER_FIELD,
         description="Gelecekteki alıcılar için tavsiyeler"
     )
-    expectations: List[str] = Field(
+    expectations: List[Tag] = Field(
         ...,
+        max_length=MAX_ITEMS_PER_FIELD,
         description="Kullanıcının beklediği ancak alamadığı özellikler"
     )
-    feature_categories: List[str] = Field(
+    feature_categories: List[FeatureCategory] = Field(
         ...,
-        description=f"İlgili ürün özellikleri. YALNIZCA şu listeden seçilmelidir: {', '.join(FEATURE_CATEGORIES)}"
+        max_length=MAX_ITEMS_PER_FIELD,
+        description="İlgili ürün özellikleri (yalnızca önceden tanımlı listeden)"
     )
 
+# Üretimi kısıtlamak için modele verilen JSON şeması (Ollama `format`, llama.cpp grammar)
+REVIEW_JSON_SCHEMA = ReviewFields.model_json_schema()
+
+# Akış modunda artımlı doğrulayıcının kullandığı aynı kısıtlar (bkz. streaming.py)
+REVIEW_STREAM_SPEC = {
+    "enum_fields": {"sentiment": list(SENTIMENTS)},
+    "list_fields": {
+        "pros": None, "cons": None, "complaints": None,
+        "suggestions": None, "expectations": None,
+        "feature_categories": FEATURE_CATEGORIES,
+    },
+    "max_items": MAX_ITEMS_PER_FIELD,
+    "max_chars": MAX_TAG_CHARS,
+}
 
 
 PROMPT_TEMPLATE = """\
-You are a product review analyst AI. Analyze the following customer reviews.
+You are a product review analyst AI. Analyze the following customer review.
 Provide the output in English only.
 
-For each review, return one JSON object with the following fields. Be precise and consistent:
+Return one JSON object with the following fields. Be precise and consistent:
 1. sentiment: "positive", "neutral", or "negative"
-2. sentiment_confidence: A float between 0 and 1 indicating your confidence in the sentiment classification. 1 means very confident, 0 means not confident at all
-3. pros: Positive aspects of the product, based on the user’s statements - max 5 words long for each tag
-4. cons: Negative aspects of the product (but not suggestions or complaints) - max 5 words long for each tag
-5. complaints: Specific problems that should be improved by the producer (e.g., “Brakes should be tighter”, “Saddle should be softer”)
-6. suggestions: Contextual advice or recommendations for potential customers, such as how or by whom the product is best used
-7. expectations: Features or qualities the user expected but the product did not provide
-8. feature_categories: choose only from the predefined list below that describe relevant product aspects
+2. pros: Positive aspects of the product, based on the user’s statements - max 5 words long for each tag
+3. cons: Negative aspects of the product (but not suggestions or complaints) - max 5 words long for each tag
+4. complaints: Specific problems that should be improved by the producer (e.g., “Brakes should be tighter”, “Saddle should be softer”)
+5. suggestions: Contextual advice or recommendations for potential customers, such as how or by whom the product is best used
+6. expectations: Features or qualities the user expected but the product did not provide
+7. feature_categories: choose only from the predefined list below that describe relevant product aspects
 
 IMPORTANT: feature_categories MUST be selected only from the predefined list below:
 Predefined Feature List: {feature_list}
 
-Return one JSON object per review, in a Python list format.
+Each list may contain at most {max_items} short tags. Use an empty list when nothing applies.
+Return exactly one JSON object with only these fields.
 
-]
-Customer Reviews:
+Customer Review:
 {review}
 IMPORTANT: Respond in English only, regardless of the review's original language.
 
 Do not include any text before or after the JSON object. Only return the JSON.
 """
 
+class GenerationStats:
+    """Yorum başına üretilen token sayısını ve gecikmeyi biriktirir."""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+        self.seconds = 0.0
+
+    def add(self, tokens: int, seconds: float):
+        self.calls += 1
+        self.tokens += tokens
+        self.seconds += seconds
+
+    @property
+    def avg_tokens(self) -> float:
+        return self.tokens / self.calls if self.calls else 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.seconds / self.calls if self.calls else 0.0
+
 # LLM ile yorum analizi yapan servis
 class LLMService:
-    def __init__(self):
+    def __init__(self, constrained: bool = True):
+        """
+        `constrained=True` iken üretim `ReviewFields` JSON şemasına ve
+        LLM_MAX_OUTPUT_TOKENS sınırına bağlanır. `False` eski serbest
+        `format="json"` davranışıdır (yalnızca karşılaştırma ölçümü için).
+        """
         # Config dosyasından ayarları çekiyoruz
         from app.core.config import settings
 
-        # Ollama üzerinden model bağlantısı kuruluyor
-        self.llm = ChatOllama(
-            base_url=settings.OLLAMA_BASE_URL,  # örn. http://localhost:11434
-            model=settings.LLM_MODEL,           # örn. qwen3:14b
-            temperature=0.7,                      # deterministik çıktı için
-            format="json"                       # burası sanırım sorun çıkarıyor
-        )
+        self.backend = settings.LLM_BACKEND
+        self.constrained = constrained
+        self.streaming = settings.LLM_STREAMING
+        self.stats = GenerationStats()
+        max_tokens = settings.LLM_MAX_OUTPUT_TOKENS if constrained else -1
+        prompt_vars = {
+            "feature_list": ", ".join(FEATURE_CATEGORIES),
+            "max_items": MAX_ITEMS_PER_FIELD,
+        }
+
+        if self.backend == "gguf":
+            # llama.cpp işçi havuzu: HTTP yok, sabit önek her çağrıda yeniden değerlendirilmiyor
+            from gguf_backend import GGUFWorkerPool
+
+            head, tail = PROMPT_TEMPLATE.split("{review}")
+            self.pool = GGUFWorkerPool(
+                model_path=settings.GGUF_MODEL_PATH,
+                prompt_prefix=head.format(**prompt_vars),
+                prompt_suffix=tail.format(),
+                workers=settings.GGUF_WORKERS,
+                n_threads=settings.GGUF_THREADS,
+                n_ctx=settings.GGUF_N_CTX,
+                json_schema=REVIEW_JSON_SCHEMA if constrained else None,
+                max_tokens=max_tokens,
+                stream_spec=REVIEW_STREAM_SPEC if self.streaming else None,
+            )
+            logger.info(f"LLMService initialized with GGUF model: {settings.GGUF_MODEL_PATH}")
+            return
+
+        # LangChain/Ollama ağır paketler; yalnızca servis gerçekten kurulurken içe aktarılıyor
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_ollama import ChatOllama
+
+        from ollama_pool import OllamaPool
+
+        # Ollama üzerinden model bağlantısı kuruluyor; OLLAMA_BASE_URLS birden fazla
+        # sunucu içeriyorsa istekler en az yüklü sağlıklı sunucuya yönlendirilir.
+        # Şema verildiğinde Ollama çıktıyı bu şemaya uyan JSON ile sınırlar
+        # (sentiment ve feature_categories enum, listelerde eleman sınırı).
+        def make_client(base_url: str):
+            return ChatOllama(
+                base_url=base_url,                  # örn. http://localhost:11434
+                model=settings.LLM_MODEL,           # örn. qwen3:14b
+                temperature=0.7,
+                format=REVIEW_JSON_SCHEMA if constrained else "json",
+                num_predict=max_tokens,
+                client_kwargs={"timeout": settings.LLM_REQUEST_TIMEOUT},
+            )
+
+        self.hosts = OllamaPool(settings.OLLAMA_BASE_URLS or [settings.OLLAMA_BASE_URL], make_client)
 
         # Prompt sabiti, özellik listesiyle birlikte kullanıma hazırlanıyor
-        self.prompt = ChatPromptTemplate.from_template(
-            PROMPT_TEMPLATE
-        ).partial(feature_list=", ".join(FEATURE_CATEGORIES))
-
-        # LangChain zinciri tanımlanıyor: prompt → LLM → yapılandırılmış çıktı
-        self.chain = self.prompt | self.llm.with_structured_output(ReviewFields)
+        self.prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE).partial(**prompt_vars)
 
-        logger.info(f"LLMService initialized with model: {settings.LLM_MODEL}")
+        logger.info(f"LLMService initialized with model: {settings.LLM_MODEL} (constrained={constrained}, "
+                    f"hosts={[h.base_url for h in self.hosts.hosts]})")
 
-    def analyse_review(self, review_text: str) -> ReviewFields | None:
+    def analyse_review(self, review_text: str) -> AnalysisRecord | None:
         """
         Verilen bir müşteri yorumunu analiz eder.
-        Başarılıysa `ReviewFields` nesnesi döner, hata olursa `None`.
+        Başarılıysa `AnalysisRecord` nesnesi döner, hata olursa `None`.
         """
         try:
             logger.info(f"Analyzing review: '{review_text[:60]}...'")
-            
-            # Prompt'u hazırla
-            prompt_messages = self.prompt.format_messages(review=review_text)
-            logger.info(f"DEBUG - Prompt messages: {prompt_messages}")
-            
-            # LLM'den ham yanıtı al
-            raw_response = self.llm.invoke(prompt_messages)
-            logger.info(f"DEBUG - Raw LLM response: {raw_response}")
-            
-            # Structured output ile parse et
-            result = self.chain.invoke({"review": review_text})
-            logger.info(f"DEBUG - Parsed result: {result}")
-            
+            started = time.perf_counter()
+
+            if self.backend == "gguf":
+                raw_text, generated_tokens = self.pool.generate(review_text)
+            elif self.streaming:
+                raw_text, generated_tokens = self.hosts.call(lambda llm: self._stream_ollama(llm, review_text))
+            else:
+                raw_text, generated_tokens = self.hosts.call(lambda llm: self._invoke_ollama(llm, review_text))
+
+            self.stats.add(generated_tokens, time.perf_counter() - started)
+            if raw_text is None:
+                logger.warning(f"Streaming aborted, output cannot match ReviewFields: '{review_text[:60]}...'")
+                return None
+            logger.debug(f"Raw LLM response ({generated_tokens} tokens): {raw_text}")
+
+            result = AnalysisRecord.from_model_output(raw_text)
+            logger.debug(f"Parsed result: {result}")
             return result
         except Exception as e:
             logger.error(f"LLM analysis failed for review: '{review_text[:60]}...'. Error: {e}")
             return None
 
+    def _invoke_ollama(self, llm, review_text: str) -> tuple[str, int]:
+        # Tek çağrı: ham yanıt alınır ve doğrudan şemaya göre doğrulanır
+        prompt_messages = self.prompt.format_messages(review=review_text)
+        raw_response = llm.invoke(prompt_messages)
+        return raw_response.content, raw_response.response_metadata.get("eval_count", 0)
+
+    def _stream_ollama(self, llm, review_text: str) -> tuple[str | None, int]:
+        """
+        Yanıtı akış halinde alır ve artımlı doğrular. Üst düzey JSON kapanınca
+        ya da çıktı geçersizleşince akış kapatılır (Ollama üretimi durdurur).
+        Geçersiz çıktıda metin yerine None döner.
+        """
+        validator = IncrementalJsonValidator(**REVIEW_STREAM_SPEC)
+        chunks = 0
+        stream = llm.stream(self.prompt.format_messages(review=review_text))
+        try:
+            for chunk in stream:
+                chunks += 1  # Ollama her parçada yaklaşık bir token gönderir
+                if validator.feed(chunk.content) != PARTIAL:
+                    break
+        finally:
+            stream.close()
+
+        if validator.status == COMPLETE:
+            return validator.text, chunks
+        if validator.status == INVALID:
+            logger.debug(f"Stream validation failed: {validator.error}")
+        return None, chunks
+
+    def host_metrics(self) -> list[dict]:
+        """Ollama sunucusu başına istek, hata, çıkarma ve gecikme metrikleri (GGUF arka ucunda boş)."""
+        return self.hosts.metrics() if self.backend != "gguf" else []
@@ -0,0 +1,66 @@
+# measure_startup.py
+# İş akışı modüllerinin içe aktarma (import) süresini ayrı, temiz Python
+# süreçlerinde ölçer ve `-X importtime` çıktısından en pahalı paketleri listeler.
+# Ağır paketlerin (sentence_transformers, sklearn, langchain) ertelenip
+# ertelenmediğini kontrol etmek için kullanılır.
+#
+# Kullanım: python measure_startup.py [--repeat 3] [--top 8]
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+MODULES = ["main", "base", "drain", "cli", "worker_daemon"]
+HEAVY_PACKAGES = ("sentence_transformers", "sklearn", "torch", "langchain_core", "langchain_ollama")
+
+
+def time_import(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def top_imports(module: str, top: int) -> list[tuple[int, str]]:
+    """`-X importtime` çıktısından kümülatif süresi en yüksek paketler (mikrosaniye)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if "." not in name.strip():
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modül içe aktarma sürelerini ölçer.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    baseline = min(time_import("os") for _ in range(args.repeat))
+    print(f"{'module':<16}{'import (s)':>12}   heavy packages loaded")
+    for module in MODULES:
+        try:
+            elapsed = min(time_import(module) for _ in range(args.repeat)) - baseline
+        except subprocess.CalledProcessError:
+            print(f"{module:<16}{'error':>12}")
+            continue
+        heavy = [name for _, name in top_imports(module, top=200) if name in HEAVY_PACKAGES]
+        print(f"{module:<16}{elapsed:>12.3f}   {', '.join(heavy) or '-'}")
+
+    for module in MODULES:
+        print(f"\n{module}: en pahalı {args.top} üst düzey paket (kümülatif ms)")
+        for cumulative, name in top_imports(module, args.top):
+            print(f"  {cumulative / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
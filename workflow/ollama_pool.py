@@ -0,0 +1,193 @@
+# ollama_pool.py
+# Birden fazla Ollama sunucusu arasında istek dağıtımı.
+# Her istek, o an en az yüklü sağlıklı sunucuya gider: skor = (eşzamanlı istek + 1)
+# × sunucunun üstel ortalama (EWMA) gecikmesi. Böylece hızlı bir makine yavaş
+# olandan orantılı olarak daha çok iş alır. Art arda max_failures hata veren
+# sunucu havuzdan çıkarılır (ejection); arka plandaki sağlık kontrolü
+# /api/tags'e yanıt aldığında sunucuyu geri alır. Tekrarlanan çıkarmalarda
+# bekleme süresi ikiye katlanır; geri alındıktan sonra en uzun bekleme süresi
+# boyunca sorunsuz kalan sunucunun sayacı sıfırlanır. Sağlıklı bir sunucu, sağlık
+# kontrolünden ancak art arda max_failures yoklama başarısız olursa çıkarılır.
+#
+# Yerel deneme için fake_ollama.py ile birkaç sahte sunucu başlatılabilir.
+
+import logging
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaHost:
+    """Tek bir model sunucusu: istemci, yük, sağlık durumu ve metrikler."""
+
+    def __init__(self, base_url: str, client):
+        self.base_url = base_url.rstrip("/")
+        self.client = client
+        self.in_flight = 0
+        self.latency = None             # EWMA, saniye (ilk başarılı çağrıya kadar bilinmiyor)
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0        # 0 = havuzda
+        self.ejections = 0
+        self.backoff = 0                # bekleme süresinin üssü; uzun süre sağlıklı kalınca sıfırlanır
+        self.readmitted_at = None       # son geri alınma zamanı (monotonic)
+        self.probe_failures = 0         # art arda başarısız sağlık yoklaması
+        # Metrikler
+        self.requests = 0
+        self.errors = 0
+        self.tokens = 0
+        self.seconds = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until == 0.0
+
+    def score(self, default_latency: float) -> float:
+        return (self.in_flight + 1) * (self.latency if self.latency is not None else default_latency)
+
+
+class OllamaPool:
+    def __init__(self, base_urls: list[str], make_client, max_failures: int = 3, eject_seconds: float = 15.0,
+                 max_eject_seconds: float = 300.0, health_interval: float = 5.0, ewma_alpha: float = 0.2):
+        """
+        `make_client(base_url)` her sunucu için bir istemci (ör. ChatOllama) oluşturur.
+        """
+        if not base_urls:
+            raise ValueError("En az bir Ollama adresi verilmelidir.")
+        self.hosts = [OllamaHost(url, make_client(url)) for url in dict.fromkeys(base_urls)]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.health_interval = health_interval
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if len(self.hosts) > 1:
+            threading.Thread(target=self._health_loop, name="ollama-health", daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Yönlendirme
+    # ------------------------------------------------------------------
+    def _acquire(self, exclude: set) -> OllamaHost:
+        with self._lock:
+            candidates = [h for h in self.hosts if h.healthy and h not in exclude]
+            if not candidates:
+                # Hepsi çıkarılmışsa iş durmasın: geri alınması en yakın olana gönder
+                remaining = [h for h in self.hosts if h not in exclude] or self.hosts
+                candidates = [min(remaining, key=lambda h: h.ejected_until)]
+            measured = [h.latency for h in candidates if h.latency is not None]
+            # Henüz ölçülmemiş sunucular ortalamayla puanlanır; ölçülmüş yoksa yalnızca yük belirler
+            default_latency = sum(measured) / len(measured) if measured else 1.0
+            host = min(candidates, key=lambda h: h.score(default_latency))
+            host.in_flight += 1
+            return host
+
+    def _release(self, host: OllamaHost, seconds: float, tokens: int, error: Exception | None):
+        with self._lock:
+            host.in_flight -= 1
+            host.requests += 1
+            host.seconds += seconds
+            if error is None:
+                host.tokens += tokens
+                host.consecutive_failures = 0
+                host.latency = seconds if host.latency is None else (
+                    self.ewma_alpha * seconds + (1 - self.ewma_alpha) * host.latency)
+                return
+            host.errors += 1
+            host.consecutive_failures += 1
+            if host.healthy and host.consecutive_failures >= self.max_failures and len(self.hosts) > 1:
+                self._eject(host, reason=str(error))
+
+    def _eject(self, host: OllamaHost, reason: str):
+        if host.readmitted_at is not None and time.monotonic() - host.readmitted_at >= self.max_eject_seconds:
+            # Geri alındıktan sonra uzun süre sağlıklı kaldı: ara sıra yaşanan kesintiler bekleme süresini biriktirmesin
+            host.backoff = 0
+        host.backoff += 1
+        host.ejections += 1
+        host.probe_failures = 0
+        wait = min(self.eject_seconds * 2 ** (host.backoff - 1), self.max_eject_seconds)
+        host.ejected_until = time.monotonic() + wait
+        logger.warning(f"Ollama host {host.base_url} ejected for {wait:.0f}s: {reason}")
+
+    def call(self, fn):
+        """
+        `fn(client)`'i en az yüklü sunucuda çalıştırır; `fn` (sonuç, token) döner.
+        Hata olursa istek bir kez başka bir sunucuda denenir.
+        """
+        tried = set()
+        attempts = min(2, len(self.hosts))
+        for attempt in range(attempts):
+            host = self._acquire(tried)
+            tried.add(host)
+            started = time.perf_counter()
+            try:
+                result, tokens = fn(host.client)
+            except Exception as e:
+                self._release(host, time.perf_counter() - started, 0, e)
+                if attempt == attempts - 1:
+                    raise
+                logger.debug(f"Ollama host {host.base_url} failed, retrying elsewhere: {e}")
+                continue
+            self._release(host, time.perf_counter() - started, tokens, None)
+            return result, tokens
+
+    # ------------------------------------------------------------------
+    # Sağlık kontrolü
+    # ------------------------------------------------------------------
+    def _probe(self, host: OllamaHost) -> bool:
+        try:
+            with urllib.request.urlopen(f"{host.base_url}/api/tags", timeout=2.0) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            now = time.monotonic()
+            for host in self.hosts:
+                if host.healthy:
+                    # Sağlıklı sunucular da (meşgul olsalar bile) yoklanır: kapanan ya da takılan
+                    # bir sunucu, üzerindeki istekler zaman aşımına düşmeden yeni iş almayı bırakır.
+                    # Yoğun yükte tek bir geç yanıt yeterli sayılmaz; art arda max_failures gerekir.
+                    ok = self._probe(host)
+                    with self._lock:
+                        host.probe_failures = 0 if ok else host.probe_failures + 1
+                        if host.healthy and host.probe_failures >= self.max_failures:
+                            self._eject(host, reason=f"{host.probe_failures} health checks failed")
+                elif now >= host.ejected_until:
+                    if self._probe(host):
+                        with self._lock:
+                            host.ejected_until = 0.0
+                            host.consecutive_failures = 0
+                            host.readmitted_at = time.monotonic()
+                        logger.info(f"Ollama host {host.base_url} re-admitted.")
+                    else:
+                        with self._lock:
+                            self._eject(host, reason="health check failed")
+
+    def close(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Metrikler
+    # ------------------------------------------------------------------
+    def metrics(self) -> list[dict]:
+        with self._lock:
+            return [{
+                "host": h.base_url,
+                "healthy": h.healthy,
+                "in_flight": h.in_flight,
+                "requests": h.requests,
+                "errors": h.errors,
+                "ejections": h.ejections,
+                "avg_latency": h.seconds / h.requests if h.requests else 0.0,
+                "ewma_latency": h.latency or 0.0,
+                "tokens": h.tokens,
+            } for h in self.hosts]
+
+    def log_metrics(self):
+        logger.info(f"{'host':<30}{'up':>4}{'requests':>10}{'errors':>8}{'ejects':>8}{'avg s':>8}{'ewma s':>8}")
+        for m in self.metrics():
+            logger.info(f"{m['host']:<30}{'yes' if m['healthy'] else 'no':>4}{m['requests']:>10}{m['errors']:>8}"
+                        f"{m['ejections']:>8}{m['avg_latency']:>8.2f}{m['ewma_latency']:>8.2f}")
@@ -0,0 +1,115 @@
+# records.py
+# LLM çıktısı ve review_analysis satırı için hafif, slotlu kayıt tipi.
+# Her sonuç için pydantic doğrulaması + model_dump() + alan başına json.dumps
+# yerine tek bir hızlı JSON çözümü ve elle yazılmış kısa kontroller kullanılır.
+# Pydantic yalnızca sınırda (modele verilen JSON şeması, main.ReviewFields) kalır.
+
+import json
+from dataclasses import dataclass
+
+try:
+    import orjson
+except ImportError:  # orjson opsiyonel; yoksa standart json kullanılır
+    orjson = None
+
+# Yorumda geçen ürün özelliklerini sınırlı bir listeden seçmek için sabit liste
+FEATURE_CATEGORIES = [
+    "ease of use", "material quality", "pricing", "durability",
+    "delivery speed", "packaging quality", "design aesthetics",
+    "ease of setup", "seller responsiveness", "size compatibility",
+    "product match with listing", "meeting expectations", "eco-friendliness",
+    "availability", "noise level", "battery life", "discount",
+    "payment options", "return process", "spare parts", "warranty",
+    "technical support", "brand trust", "stock issue"
+]
+SENTIMENTS = ("positive", "negative", "neutral")
+
+# Çıktı sınırları: model fazladan anahtar, uzun etiket veya uzun liste üretip token harcamasın
+MAX_ITEMS_PER_FIELD = 5     # her liste alanında en fazla eleman
+MAX_TAG_CHARS = 60          # her etiketin en fazla karakter sayısı
+
+LIST_FIELDS = ("pros", "cons", "complaints", "suggestions", "expectations", "feature_categories")
+ALL_FIELDS = frozenset(("sentiment",) + LIST_FIELDS)
+_FEATURE_SET = frozenset(FEATURE_CATEGORIES)
+
+
+if orjson is not None:
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+else:
+    loads = json.loads
+
+    def dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+
+@dataclass(slots=True)
+class AnalysisRecord:
+    """Bir yorumun analiz sonucu (review_analysis satırı ile aynı alanlar)."""
+    sentiment: str
+    pros: list
+    cons: list
+    complaints: list
+    suggestions: list
+    expectations: list
+    feature_categories: list
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AnalysisRecord":
+        """Şema kontrollerini (main.ReviewFields ile aynı kurallar) yapıp kayıt oluşturur; uymazsa ValueError."""
+        if not isinstance(data, dict) or data.keys() != ALL_FIELDS:
+            raise ValueError(f"beklenen alanlar {sorted(ALL_FIELDS)}")
+        if data["sentiment"] not in SENTIMENTS:
+            raise ValueError(f"geçersiz sentiment: {data['sentiment']!r}")
+        for field in LIST_FIELDS:
+            items = data[field]
+            if not isinstance(items, list) or len(items) > MAX_ITEMS_PER_FIELD:
+                raise ValueError(f"'{field}' en fazla {MAX_ITEMS_PER_FIELD} elemanlı bir liste olmalı")
+            for item in items:
+                if not isinstance(item, str) or len(item) > MAX_TAG_CHARS:
+                    raise ValueError(f"'{field}' içinde geçersiz etiket: {item!r}")
+        if not _FEATURE_SET.issuperset(data["feature_categories"]):
+            raise ValueError("feature_categories önceden tanımlı listenin dışında değer içeriyor")
+        return cls(data["sentiment"], data["pros"], data["cons"], data["complaints"],
+                   data["suggestions"], data["expectations"], data["feature_categories"])
+
+    @classmethod
+    def from_json(cls, text) -> "AnalysisRecord":
+        return cls.from_dict(loads(text))
+
+    @classmethod
+    def from_model_output(cls, text: str) -> "AnalysisRecord":
+        """Model çıktısındaki ilk JSON nesnesini (veya tek elemanlı listeyi) kayda çevirir."""
+        stripped = text.strip()
+        if stripped.startswith("{") and stripped.endswith("}"):
+            # Şema kısıtlı / akış modunda çıktı zaten tam olarak tek bir nesnedir
+            try:
+                return cls.from_json(stripped)
+            except json.JSONDecodeError:  # orjson.JSONDecodeError da bunun alt sınıfı
+                pass
+        starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+        if not starts:
+            raise ValueError("Model çıktısında JSON bulunamadı.")
+        data, _ = json.JSONDecoder().raw_decode(text[min(starts):])
+        if isinstance(data, list):
+            data = data[0] if data else {}
+        return cls.from_dict(data)
+
+    def to_dict(self) -> dict:
+        return {
+            "sentiment": self.sentiment,
+            "pros": self.pros,
+            "cons": self.cons,
+            "complaints": self.complaints,
+            "suggestions": self.suggestions,
+            "expectations": self.expectations,
+            "feature_categories": self.feature_categories,
+        }
+
+    def to_db_params(self) -> tuple:
+        """review_analysis INSERT parametreleri: sentiment ve JSON metni olarak altı liste alanı."""
+        return (self.sentiment, dumps(self.pros), dumps(self.cons), dumps(self.complaints),
+                dumps(self.suggestions), dumps(self.expectations), dumps(self.feature_categories))
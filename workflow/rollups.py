@@ -0,0 +1,175 @@
+# rollups.py
+# Ürün başına önceden hesaplanmış özet tabloları (rollup):
+#   product_rollup          – duygu dağılımı, analiz edilen yorum sayısı, puan toplamı/adedi
+#   product_feature_rollup  – feature_categories etiketlerinin geçme sayısı
+#   product_monthly_rollup  – publisher_date ayına göre duygu ve puan eğilimi
+# Tablolar review_analysis'e yapılan her INSERT ifadesinde bir tetikleyiciyle
+# artımlı güncellenir; dashboard istek anında raw_reviews × review_analysis
+# birleştirmesi yapmak yerine ürün anahtarıyla doğrudan okur (api_server.py).
+#
+# Kurulum (tekrar çalıştırılabilir) ve mevcut veriden doldurma:
+#   python rollups.py --install --rebuild
+
+import argparse
+import logging
+
+import psycopg2
+
+from app.core.config import settings
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS product_rollup (
+    product_id        TEXT PRIMARY KEY,
+    analysed_reviews  BIGINT NOT NULL DEFAULT 0,
+    positive          BIGINT NOT NULL DEFAULT 0,
+    negative          BIGINT NOT NULL DEFAULT 0,
+    neutral           BIGINT NOT NULL DEFAULT 0,
+    rating_sum        BIGINT NOT NULL DEFAULT 0,
+    rating_count      BIGINT NOT NULL DEFAULT 0,
+    last_updated      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS product_feature_rollup (
+    product_id  TEXT NOT NULL,
+    feature     TEXT NOT NULL,
+    mentions    BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (product_id, feature)
+);
+
+CREATE TABLE IF NOT EXISTS product_monthly_rollup (
+    product_id        TEXT NOT NULL,
+    month             DATE NOT NULL,
+    analysed_reviews  BIGINT NOT NULL DEFAULT 0,
+    positive          BIGINT NOT NULL DEFAULT 0,
+    negative          BIGINT NOT NULL DEFAULT 0,
+    neutral           BIGINT NOT NULL DEFAULT 0,
+    rating_sum        BIGINT NOT NULL DEFAULT 0,
+    rating_count      BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (product_id, month)
+);
+"""
+
+
+def _upsert_sql(source: str, where: str = "") -> str:
+    """
+    `source` (tetikleyicide yeni satırlar, yeniden kurulumda review_analysis)
+    satırlarını ürün/özellik/ay bazında toplayıp rollup tablolarına ekleyen SQL.
+    """
+    return f"""
+    INSERT INTO product_rollup AS r (product_id, analysed_reviews, positive, negative, neutral,
+                                     rating_sum, rating_count, last_updated)
+    SELECT rr.product_id, COUNT(*),
+           COUNT(*) FILTER (WHERE n.sentiment = 'positive'),
+           COUNT(*) FILTER (WHERE n.sentiment = 'negative'),
+           COUNT(*) FILTER (WHERE n.sentiment = 'neutral'),
+           COALESCE(SUM(rr.rating_code), 0), COUNT(rr.rating_code), NOW()
+    FROM {source} n
+    JOIN raw_reviews rr ON rr.id = n.review_id
+    {where}
+    GROUP BY rr.product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        analysed_reviews = r.analysed_reviews + EXCLUDED.analysed_reviews,
+        positive = r.positive + EXCLUDED.positive,
+        negative = r.negative + EXCLUDED.negative,
+        neutral = r.neutral + EXCLUDED.neutral,
+        rating_sum = r.rating_sum + EXCLUDED.rating_sum,
+        rating_count = r.rating_count + EXCLUDED.rating_count,
+        last_updated = NOW();
+
+    INSERT INTO product_feature_rollup AS f (product_id, feature, mentions)
+    SELECT rr.product_id, fc.feature, COUNT(*)
+    FROM {source} n
+    JOIN raw_reviews rr ON rr.id = n.review_id
+    CROSS JOIN LATERAL jsonb_array_elements_text(n.feature_categories::jsonb) AS fc(feature)
+    {where}
+    GROUP BY rr.product_id, fc.feature
+    ON CONFLICT (product_id, feature) DO UPDATE SET
+        mentions = f.mentions + EXCLUDED.mentions;
+
+    INSERT INTO product_monthly_rollup AS m (product_id, month, analysed_reviews, positive, negative,
+                                             neutral, rating_sum, rating_count)
+    SELECT rr.product_id, date_trunc('month', rr.publisher_date::timestamptz)::date, COUNT(*),
+           COUNT(*) FILTER (WHERE n.sentiment = 'positive'),
+           COUNT(*) FILTER (WHERE n.sentiment = 'negative'),
+           COUNT(*) FILTER (WHERE n.sentiment = 'neutral'),
+           COALESCE(SUM(rr.rating_code), 0), COUNT(rr.rating_code)
+    FROM {source} n
+    JOIN raw_reviews rr ON rr.id = n.review_id
+    {where + " AND" if where else "WHERE"} rr.publisher_date IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (product_id, month) DO UPDATE SET
+        analysed_reviews = m.analysed_reviews + EXCLUDED.analysed_reviews,
+        positive = m.positive + EXCLUDED.positive,
+        negative = m.negative + EXCLUDED.negative,
+        neutral = m.neutral + EXCLUDED.neutral,
+        rating_sum = m.rating_sum + EXCLUDED.rating_sum,
+        rating_count = m.rating_count + EXCLUDED.rating_count;
+    """
+
+
+# İfade düzeyinde tetikleyici: aynı INSERT ifadesindeki tüm satırlar tek seferde toplanır
+TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION rollup_review_analysis_inserted() RETURNS trigger AS $$
+BEGIN
+    {_upsert_sql("new_rows")}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS review_analysis_rollup ON review_analysis;
+CREATE TRIGGER review_analysis_rollup
+    AFTER INSERT ON review_analysis
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_review_analysis_inserted();
+"""
+
+
+def install_rollups(dsn: str):
+    """Rollup tablolarını ve artımlı güncelleme tetikleyicisini kurar."""
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_SQL)
+            cur.execute(TRIGGER_SQL)
+    logging.info("Rollup tabloları ve tetikleyicisi kuruldu.")
+
+
+def rebuild_rollups(dsn: str, product_id: str | None = None):
+    """
+    Rollup'ları mevcut review_analysis verisinden yeniden hesaplar (ilk kurulum veya düzeltme).
+    Tek işlemde yapılır; ürün verilirse yalnızca o ürün yeniden kurulur.
+    """
+    tables = ("product_rollup", "product_feature_rollup", "product_monthly_rollup")
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            # Yeniden kurulum sırasında tetikleyiciden gelen eklemeler çift sayılmasın
+            cur.execute("LOCK TABLE review_analysis IN SHARE MODE;")
+            if product_id is None:
+                for table in tables:
+                    cur.execute(f"DELETE FROM {table};")
+                cur.execute(_upsert_sql("review_analysis"))
+            else:
+                for table in tables:
+                    cur.execute(f"DELETE FROM {table} WHERE product_id = %s;", (product_id,))
+                cur.execute(_upsert_sql("review_analysis", where="WHERE rr.product_id = %(product_id)s"),
+                            {"product_id": product_id})
+    logging.info(f"Rollup'lar yeniden hesaplandı ({product_id or 'tüm ürünler'}).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ürün rollup tablolarını kurar ve yeniden hesaplar.")
+    parser.add_argument("--install", action="store_true", help="Tabloları ve tetikleyiciyi kur")
+    parser.add_argument("--rebuild", action="store_true", help="Rollup'ları mevcut veriden yeniden hesapla")
+    parser.add_argument("--product", help="Yalnızca bu ürünü yeniden hesapla")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.install:
+        install_rollups(settings.DATABASE_URL)
+    if args.rebuild:
+        rebuild_rollups(settings.DATABASE_URL, args.product)
+    if not (args.install or args.rebuild):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# streaming.py
+# Token token gelen model çıktısını artımlı olarak ayrıştıran doğrulayıcı.
+# Üst düzey nesne (veya toplu promptlarda dizi) kapanır kapanmaz COMPLETE,
+# çıktı artık şemaya uyamayacak hale geldiği anda INVALID döner; böylece
+# üretim erken kesilebilir.
+
+import json
+
+PARTIAL = "partial"
+COMPLETE = "complete"
+INVALID = "invalid"
+
+# Kök JSON başlamadan önce kabul edilen en fazla serbest metin (ör. "```json")
+MAX_LEADING_CHARS = 32
+
+
+class _Frame:
+    """Yığındaki bir kapsayıcı: kök dizi, kayıt nesnesi veya kayıt içindeki liste alanı."""
+    __slots__ = ("role", "state", "field", "seen", "count")
+
+    def __init__(self, role: str, field: str | None = None):
+        self.role = role          # "root_array" | "record" | "list"
+        self.state = "first"      # first | key | colon | value | comma
+        self.field = field        # liste alanının adı
+        self.seen = set()         # kayıtta görülen anahtarlar
+        self.count = 0            # listedeki eleman sayısı
+
+
+class IncrementalJsonValidator:
+    """
+    Şema bilgisi:
+      enum_fields: değeri tek bir string olan ve izin verilen değerleri sabit alanlar
+      list_fields: değeri string listesi olan alanlar; değer None değilse elemanlar bu kümeden seçilmeli
+    Tüm alanlar zorunludur, fazladan anahtara izin verilmez.
+    """
+
+    def __init__(self, enum_fields: dict[str, list[str]], list_fields: dict[str, list[str] | None],
+                 max_items: int, max_chars: int, allow_array: bool = True):
+        self.enum_fields = {k: set(v) for k, v in enum_fields.items()}
+        self.list_fields = {k: (set(v) if v is not None else None) for k, v in list_fields.items()}
+        self.required = set(self.enum_fields) | set(self.list_fields)
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.allow_array = allow_array
+
+        self.status = PARTIAL
+        self.error = None
+        self._stack: list[_Frame] = []
+        self._started = False
+        self._leading = 0
+        self._chars: list[str] = []     # kök JSON'un metni
+        self._string = None             # açık string'in ham içeriği
+        self._string_kind = None        # key | enum | item
+        self._escape = False
+        self._key = None                # kayıtta değeri beklenen anahtar
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chars)
+
+    def feed(self, chunk: str) -> str:
+        for ch in chunk:
+            if self.status != PARTIAL:
+                break
+            self._step(ch)
+        return self.status
+
+    # ------------------------------------------------------------------
+    def _fail(self, reason: str):
+        self.status = INVALID
+        self.error = reason
+
+    def _step(self, ch: str):
+        if not self._started:
+            if ch == "{" or (ch == "[" and self.allow_array):
+                self._started = True
+            else:
+                self._leading += 1
+                if self._leading > MAX_LEADING_CHARS:
+                    self._fail("JSON başlamadan önce çok fazla metin")
+                return
+
+        self._chars.append(ch)
+
+        if self._string is not None:
+            self._string_char(ch)
+            return
+        if ch in " \t\r\n":
+            return
+        if not self._stack:
+            self._open_root(ch)
+            return
+
+        frame = self._stack[-1]
+        if ch == '"':
+            self._open_string(frame)
+        elif ch == ":":
+            if frame.role != "record" or frame.state != "colon":
+                return self._fail("beklenmeyen ':'")
+            frame.state = "value"
+        elif ch == ",":
+            if frame.state != "comma":
+                return self._fail("beklenmeyen ','")
+            frame.state = "key" if frame.role == "record" else "value"
+        elif ch == "{":
+            if frame.role != "root_array" or frame.state not in ("first", "value"):
+                return self._fail("beklenmeyen '{'")
+            self._stack.append(_Frame("record"))
+        elif ch == "[":
+            if frame.role != "record" or frame.state != "value" or self._key not in self.list_fields:
+                return self._fail(f"'{self._key}' alanı liste olamaz")
+            self._stack.append(_Frame("list", field=self._key))
+        elif ch == "}":
+            if frame.role != "record" or frame.state not in ("first", "comma"):
+                return self._fail("beklenmeyen '}'")
+            missing = self.required - frame.seen
+            if missing:
+                return self._fail(f"eksik alanlar: {sorted(missing)}")
+            self._close()
+        elif ch == "]":
+            if frame.role == "record" or frame.state not in ("first", "comma"):
+                return self._fail("beklenmeyen ']'")
+            self._close()
+        else:
+            # Şemada sayı, true/false/null gibi değerler yok
+            self._fail(f"beklenmeyen karakter {ch!r}")
+
+    def _open_root(self, ch: str):
+        self._stack.append(_Frame("record" if ch == "{" else "root_array"))
+
+    def _close(self):
+        self._stack.pop()
+        if not self._stack:
+            self.status = COMPLETE
+            return
+        parent = self._stack[-1]
+        parent.state = "comma"
+        if parent.role == "record":
+            self._key = None
+
+    def _open_string(self, frame: _Frame):
+        if frame.role == "record" and frame.state in ("first", "key"):
+            self._string_kind = "key"
+        elif frame.role == "record" and frame.state == "value" and self._key in self.enum_fields:
+            self._string_kind = "enum"
+        elif frame.role == "list" and frame.state in ("first", "value"):
+            self._string_kind = "item"
+        else:
+            return self._fail("beklenmeyen string")
+        self._string = ""
+        self._escape = False
+
+    def _allowed_values(self) -> set[str] | None:
+        if self._string_kind == "key":
+            return self.required
+        if self._string_kind == "enum":
+            return self.enum_fields[self._key]
+        return self.list_fields[self._stack[-1].field]
+
+    def _string_char(self, ch: str):
+        if self._escape:
+            self._escape = False
+            self._string += ch
+            return
+        if ch == "\\":
+            self._escape = True
+            self._string += ch
+            return
+        if ch == '"':
+            return self._close_string()
+
+        self._string += ch
+        allowed = self._allowed_values()
+        if allowed is not None and "\\" not in self._string:
+            # Açık string hiçbir izinli değerin öneki değilse artık geçerli olamaz
+            if not any(v.startswith(self._string) for v in allowed):
+                return self._fail(f"izin verilmeyen değer: {self._string!r}")
+        elif self._string_kind == "item" and "\\" not in self._string and len(self._string) > self.max_chars:
+            return self._fail("etiket çok uzun")
+
+    def _close_string(self):
+        try:
+            value = json.loads('"' + self._string + '"')
+        except json.JSONDecodeError:
+            return self._fail("geçersiz string")
+        kind, self._string, self._string_kind = self._string_kind, None, None
+        frame = self._stack[-1]
+
+        if kind == "key":
+            if value not in self.required or value in frame.seen:
+                return self._fail(f"geçersiz veya tekrarlanan anahtar: {value!r}")
+            frame.seen.add(value)
+            self._key = value
+            frame.state = "colon"
+            return
+
+        allowed = self.enum_fields[self._key] if kind == "enum" else self.list_fields[frame.field]
+        if allowed is not None and value not in allowed:
+            return self._fail(f"izin verilmeyen değer: {value!r}")
+        if kind == "item":
+            frame.count += 1
+            if frame.count > self.max_items:
+                return self._fail(f"'{frame.field}' alanında çok fazla eleman")
+            if len(value) > self.max_chars:
+                return self._fail("etiket çok uzun")
+        frame.state = "comma"
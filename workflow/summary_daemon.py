@@ -0,0 +1,154 @@
+# summary_daemon.py
+# review_analysis tablosuna yapılan her ekleme, ilgili ürün ID'siyle bir
+# PostgreSQL bildirimi (NOTIFY) üretir. Bu daemon bildirimleri dinler, ürün
+# başına biriktirir (debounce) ve yalnızca değişen ürünlerin analysis_summary
+# kaydını yeniden hesaplar:
+#   - ürün için quiet_seconds boyunca yeni analiz gelmezse, veya
+#   - max_pending bildirim birikirse, veya
+#   - ilk bildirimden bu yana max_wait saniye geçtiyse (sürekli akışta bile güncel kalsın)
+#
+# Kullanım: python summary_daemon.py --quiet 30 --max-pending 200
+
+import argparse
+import logging
+import select
+import signal
+import time
+
+import psycopg2
+
+from app.core.config import settings
+from base import SummaryClusterer
+
+NOTIFY_CHANNEL = "review_analysis_inserted"
+
+# İfade düzeyinde tetikleyici: bir INSERT ifadesindeki satırların ürünleri için
+# ürün başına tek bildirim gönderir.
+NOTIFY_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_review_analysis_inserted() RETURNS trigger AS $$
+DECLARE
+    pid text;
+BEGIN
+    FOR pid IN
+        SELECT DISTINCT rr.product_id
+        FROM new_rows n
+        JOIN raw_reviews rr ON rr.id = n.review_id
+    LOOP
+        PERFORM pg_notify('{NOTIFY_CHANNEL}', pid);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS review_analysis_notify ON review_analysis;
+CREATE TRIGGER review_analysis_notify
+    AFTER INSERT ON review_analysis
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_review_analysis_inserted();
+"""
+
+
+def install_notify_trigger(dsn: str):
+    """Bildirim tetikleyicisini oluşturur (tekrar çalıştırılabilir)."""
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(NOTIFY_TRIGGER_SQL)
+    logging.info("review_analysis bildirim tetikleyicisi kuruldu.")
+
+
+class SummaryDaemon:
+    def __init__(self, dsn: str, quiet_seconds: float = 30.0, max_pending: int = 200,
+                 max_wait: float = 300.0):
+        self.dsn = dsn
+        self.quiet_seconds = quiet_seconds
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        # product_id -> [ilk bildirim zamanı, son bildirim zamanı, bildirim sayısı]
+        self.dirty: dict[str, list] = {}
+        self._clusterer = None
+        self._stop = False
+
+    def request_stop(self, signum=None, frame=None):
+        logging.info("Durdurma isteği alındı.")
+        self._stop = True
+
+    def _mark_dirty(self, product_id: str):
+        now = time.monotonic()
+        entry = self.dirty.get(product_id)
+        if entry is None:
+            self.dirty[product_id] = [now, now, 1]
+        else:
+            entry[1] = now
+            entry[2] += 1
+
+    def _deadline(self, entry: list) -> float:
+        first, last, _ = entry
+        return min(last + self.quiet_seconds, first + self.max_wait)
+
+    def _due_products(self) -> list[str]:
+        now = time.monotonic()
+        return [pid for pid, entry in self.dirty.items()
+                if entry[2] >= self.max_pending or self._deadline(entry) <= now]
+
+    def _next_timeout(self) -> float:
+        if not self.dirty:
+            return 5.0
+        soonest = min(self._deadline(entry) for entry in self.dirty.values())
+        return max(0.0, min(5.0, soonest - time.monotonic()))
+
+    def _refresh(self, product_id: str):
+        _, _, count = self.dirty.pop(product_id)
+        logging.info(f"'{product_id}' için özet yenileniyor ({count} yeni bildirim).")
+        try:
+            if self._clusterer is None:
+                self._clusterer = SummaryClusterer(self.dsn)
+            self._clusterer.run(product_id=product_id)
+        except Exception as e:
+            logging.error(f"Summary refresh failed for product_id {product_id}: {e}")
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+        logging.info(f"'{NOTIFY_CHANNEL}' kanalı dinleniyor "
+                     f"(quiet={self.quiet_seconds}s, max_pending={self.max_pending}, max_wait={self.max_wait}s)")
+
+        try:
+            while not self._stop:
+                if select.select([conn], [], [], self._next_timeout()) != ([], [], []):
+                    conn.poll()
+                    while conn.notifies:
+                        self._mark_dirty(conn.notifies.pop(0).payload)
+                for product_id in self._due_products():
+                    self._refresh(product_id)
+        finally:
+            # Kapanırken bekleyen ürünlerin özetini güncel bırak
+            for product_id in list(self.dirty):
+                self._refresh(product_id)
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="review_analysis eklemelerini dinleyip ürün özetlerini günceller.")
+    parser.add_argument("--quiet", type=float, default=30.0,
+                        help="Ürün için bu kadar saniye yeni analiz gelmezse özet yenilenir")
+    parser.add_argument("--max-pending", type=int, default=200,
+                        help="Bu kadar bildirim birikince beklemeden yenilenir")
+    parser.add_argument("--max-wait", type=float, default=300.0,
+                        help="İlk bildirimden sonra en fazla bekleme süresi (sn)")
+    parser.add_argument("--install-trigger", action="store_true",
+                        help="Başlamadan önce bildirim tetikleyicisini kur")
+    args = parser.parse_args()
+
+    if args.install_trigger:
+        install_notify_trigger(settings.DATABASE_URL)
+    SummaryDaemon(settings.DATABASE_URL, quiet_seconds=args.quiet,
+                  max_pending=args.max_pending, max_wait=args.max_wait).run()
+
+
+if __name__ == "__main__":
+    main()
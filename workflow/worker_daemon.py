@@ -0,0 +1,108 @@
+# worker_daemon.py
+# LLMService'i ve gömme (embedding) modelini bellekte sıcak tutan yerel daemon.
+# CLI her çalıştırmada LangChain/torch içe aktarmak ve modeli yüklemek yerine
+# işi Unix soketi üzerinden bu sürece gönderir; çağrı başına başlangıç maliyeti
+# neredeyse sıfıra iner.
+#
+# Protokol: istemci tek satırlık bir JSON iş gönderir, daemon tek satırlık JSON yanıt döner.
+#   {"job": "ping"}
+#   {"job": "analyse", "text": "..."}
+#   {"job": "summarise", "product_id": "8883139"}
+#   {"job": "drain", "product_ids": [...], "workers": 2, "page_size": 10, ...}
+#
+# Başlatma: python worker_daemon.py   (soket yolu: settings.WORKER_SOCKET)
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from app.core.config import settings
+
+# drain işine istemciden geçirilebilecek DrainRunner seçenekleri
+DRAIN_OPTIONS = ("workers", "page_size", "queue_size", "summarise", "dedup_threshold")
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            job = json.loads(line)
+            response = self.server.dispatch(job)
+        except Exception as e:
+            logging.error(f"Daemon job failed: {e}")
+            response = {"status": "error", "error": str(e)}
+        self.wfile.write((json.dumps(response, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+
+
+class WorkerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        # Ağır içe aktarımlar ve model yüklemeleri yalnızca burada, bir kez yapılır
+        from base import SummaryClusterer
+        from main import LLMService
+
+        self.llm_service = LLMService()
+        self.clusterer = SummaryClusterer(settings.DATABASE_URL)
+        self.clusterer.model  # gömme modelini şimdi yükle
+        # Aynı ürünlerin iki drain işi tarafından birlikte işlenmemesi için drain işleri sıralanır
+        self._drain_lock = threading.Lock()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _JobHandler)
+        logging.info(f"Worker daemon ready on {socket_path}")
+
+    def dispatch(self, job: dict) -> dict:
+        kind = job.get("job")
+        if kind == "ping":
+            return {"status": "ok"}
+        if kind == "analyse":
+            result = self.llm_service.analyse_review(job["text"])
+            return {"status": "ok", "result": result.to_dict() if result is not None else None}
+        if kind == "summarise":
+            self.clusterer.run(product_id=job["product_id"])
+            return {"status": "ok"}
+        if kind == "drain":
+            from drain import DrainRunner
+
+            options = {k: job[k] for k in DRAIN_OPTIONS if k in job}
+            with self._drain_lock:
+                runner = DrainRunner(settings.DATABASE_URL, product_ids=job["product_ids"],
+                                     llm_service=self.llm_service, clusterer=self.clusterer,
+                                     once=True, **options)
+                runner.run()
+            if runner.error:
+                return {"status": "error", "error": runner.error, "throughput": runner.throughput_rows()}
+            return {"status": "ok", "throughput": runner.throughput_rows()}
+        return {"status": "error", "error": f"unknown job: {kind}"}
+
+
+def submit_job(job: dict, socket_path: str | None = None, timeout: float | None = None) -> dict:
+    """İşi çalışan daemon'a gönderir ve yanıtı döner. Daemon yoksa ConnectionError/FileNotFoundError fırlatır."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or settings.WORKER_SOCKET)
+        sock.sendall((json.dumps(job, ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def main():
+    server = WorkerDaemon(settings.WORKER_SOCKET)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Worker daemon stopping.")
+    finally:
+        server.server_close()
+        os.unlink(settings.WORKER_SOCKET)
+
+
+if __name__ == "__main__":
+    main()